@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import poke_api
+import poke_api_standin
+from poke_api_standin import (
+    MOVES,
+    MOVES_PER_POKEMON,
+    POKEMON,
+    SEED,
+    SyntheticCatalog,
+)
+
+
+class SyntheticResponse:
+    def __init__(self, url: str, body: Optional[bytes]):
+        self.url = url
+        self.status_code = 404 if body is None else 200
+        self.headers = {}
+        self.content = body
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise poke_api.requests.HTTPError(f"{self.status_code} for {self.url}")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# Stands in for poke_api.HttpClient, serving a SyntheticCatalog without a
+# network round trip.
+class SyntheticClient:
+    def __init__(self, catalog: SyntheticCatalog, base_url: str = poke_api.BASE_URL):
+        self.catalog = catalog
+        self.base_url = base_url
+
+    def get(self, url: str, headers: Optional[dict] = None) -> SyntheticResponse:
+        path = url.removeprefix(self.base_url)
+        return SyntheticResponse(url, self.catalog.document(self.base_url, path))
+
+    def close(self):
+        pass
+
+    def stats(self) -> str:
+        return ""
+
+
+# The crawled model before types and moves were interned, kept to compare.
+@dataclass
+class PlainType:
+    name: str
+
+
+@dataclass
+class PlainMove:
+    name: str
+    power: int
+
+
+@dataclass
+class PlainPokemon:
+    name: str
+    order: int
+    height: float
+    weight: float
+    types: List[PlainType]
+    moves: List[PlainMove]
+
+
+def plain(pokemon: poke_api.Pokemon) -> PlainPokemon:
+    return PlainPokemon(
+        name=pokemon.name,
+        order=pokemon.order,
+        height=pokemon.height,
+        weight=pokemon.weight,
+        types=[PlainType(type.name) for type in pokemon.types],
+        moves=[PlainMove(move.name, move.power) for move in pokemon.moves],
+    )
+
+
+def max_rss() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+async def load(model: str, catalog: SyntheticCatalog) -> list:
+    fetcher = poke_api.Fetcher(client=SyntheticClient(catalog))
+    loaded = []
+    async for pokemon_list in poke_api.crawl_pages(fetcher):
+        loaded.extend(map(plain, pokemon_list) if model == "plain" else pokemon_list)
+    return loaded
+
+
+def measure_memory(args) -> dict:
+    catalog = SyntheticCatalog(
+        args.pokemon, args.moves, args.moves_per_pokemon, args.seed
+    )
+    baseline = max_rss()
+    started = time.perf_counter()
+    loaded = asyncio.run(load(args.model, catalog))
+    elapsed = time.perf_counter() - started
+    peak = max_rss()
+    return {
+        "model": args.model,
+        "pokemon": len(loaded),
+        "moves": sum(len(pokemon.moves) for pokemon in loaded),
+        "seconds": round(elapsed, 3),
+        "baseline_mib": round(baseline / 2**20, 1),
+        "peak_mib": round(peak / 2**20, 1),
+        "load_mib": round((peak - baseline) / 2**20, 1),
+    }
+
+
+def memory(args):
+    if args.model:
+        print(json.dumps(measure_memory(args)))
+        return
+
+    # peak RSS only grows, so every model is loaded in a process of its own
+    results = []
+    for model in ("plain", "compact"):
+        command = [sys.executable, __file__, "memory", "--model", model]
+        for option in ("pokemon", "moves", "moves_per_pokemon", "seed"):
+            command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+        output = subprocess.run(command, check=True, capture_output=True, text=True)
+        result = json.loads(output.stdout)
+        results.append(result)
+        print(
+            "{model:<8} {pokemon:>6} pokemon {moves:>8} moves  "
+            "peak {peak_mib:>7} MiB  load {load_mib:>7} MiB  "
+            "{seconds:>7} s".format(**result)
+        )
+
+    plain_load, compact_load = (result["load_mib"] for result in results)
+    if plain_load:
+        print(f"peak RSS of the load down {1 - compact_load / plain_load:.0%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+async def crawl(args) -> tuple:
+    client = poke_api.HttpClient(args.concurrency)
+    fetcher = poke_api.Fetcher(args.concurrency, client=client)
+    try:
+        pokemon_list = await poke_api.fetch(
+            args.endpoint, args.name, fetcher, limit=args.limit
+        )
+    finally:
+        fetcher.close()
+    return pokemon_list, client.hosts
+
+
+def measure_fetch(args) -> dict:
+    poke_api.BASE_URL = args.base_url
+    baseline = max_rss()
+    started = time.perf_counter()
+    pokemon_list, hosts = asyncio.run(crawl(args))
+    elapsed = time.perf_counter() - started
+    peak = max_rss()
+    requests = sum(stats.requests for stats in hosts.values())
+    return {
+        "crawl": f"{args.endpoint} {args.name}",
+        "pokemon": len(pokemon_list),
+        "requests": requests,
+        "retries": sum(stats.retries for stats in hosts.values()),
+        "seconds": round(elapsed, 3),
+        "pokemon_per_s": round(len(pokemon_list) / elapsed, 1),
+        "requests_per_s": round(requests / elapsed, 1),
+        "peak_mib": round(peak / 2**20, 1),
+        "load_mib": round((peak - baseline) / 2**20, 1),
+    }
+
+
+def fetch(args):
+    if args.base_url:
+        print(json.dumps(measure_fetch(args)))
+        return
+
+    crawls = [("type", name) for name in args.type or ["type-0"]]
+    crawls += [("move", name) for name in args.move or ["move-0"]]
+    results = []
+    with poke_api_standin.from_arguments(args) as server:
+        for endpoint, name in crawls:
+            # a process per crawl, for its own peak RSS
+            command = [
+                sys.executable,
+                __file__,
+                "fetch",
+                "--base-url",
+                server.base_url,
+                "--endpoint",
+                endpoint,
+                "--name",
+                name,
+                "--concurrency",
+                str(args.concurrency),
+                "--limit",
+                str(args.limit),
+            ]
+            before = server.stats()
+            output = subprocess.run(command, check=True, capture_output=True, text=True)
+            after = server.stats()
+            result = json.loads(output.stdout)
+            result.update(
+                (f"server_{key}", after[key] - before[key])
+                for key in ("served", "connections", "errors", "throttled")
+            )
+            results.append(result)
+            print(
+                "{crawl:<16} {pokemon:>5} pokemon {requests:>6} requests "
+                "({retries} retries)  {seconds:>7} s  {pokemon_per_s:>7} pokemon/s  "
+                "{requests_per_s:>8} requests/s  peak {peak_mib:>6} MiB".format(
+                    **result
+                )
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    memory_parser = commands.add_parser(
+        "memory",
+        help="compare the peak RSS of a full-catalog load with and without "
+        "interned types and moves",
+    )
+    memory_parser.add_argument("--model", choices=["plain", "compact"])
+    memory_parser.add_argument("--pokemon", type=int, default=POKEMON)
+    memory_parser.add_argument("--moves", type=int, default=MOVES)
+    memory_parser.add_argument(
+        "--moves-per-pokemon", type=int, default=MOVES_PER_POKEMON
+    )
+    memory_parser.add_argument("--seed", type=int, default=SEED)
+    memory_parser.add_argument("--output", type=str, help="write results as JSON")
+    memory_parser.set_defaults(run=memory)
+
+    fetch_parser = commands.add_parser(
+        "fetch",
+        help="crawl types and moves from a local stand-in server and report "
+        "throughput, requests and peak RSS",
+    )
+    fetch_parser.add_argument(
+        "--type",
+        action="append",
+        help="type to crawl, can be repeated (default type-0 of the synthetic "
+        "catalog)",
+    )
+    fetch_parser.add_argument(
+        "--move",
+        action="append",
+        help="move to crawl, can be repeated (default move-0 of the synthetic "
+        "catalog)",
+    )
+    fetch_parser.add_argument("--concurrency", type=int, default=poke_api.CONCURRENCY)
+    fetch_parser.add_argument(
+        "--limit", type=int, default=0, help="maximum number of pokemon, 0 for all"
+    )
+    fetch_parser.add_argument("--output", type=str, help="write results as JSON")
+    poke_api_standin.add_arguments(fetch_parser)
+    # set for the crawl run in a process of its own
+    fetch_parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    fetch_parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    fetch_parser.add_argument("--name", help=argparse.SUPPRESS)
+    fetch_parser.set_defaults(run=fetch)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
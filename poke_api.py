@@ -1,139 +1,944 @@
 import requests
 import asyncio
 import argparse
+import contextlib
+import hashlib
 import json
-from dataclasses import dataclass
-from typing import List
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlsplit
 
 BASE_URL = "http://pokeapi.co/api/v2"
 LIMIT = 1
-
-
-@dataclass
+CONCURRENCY = 16
+CACHE_SIZE = 4096
+CACHE_TTL = 24 * 60 * 60
+PAGE_SIZE = 100
+# requests per second across the whole crawl, 0 for no limit
+RATE = 0.0
+RETRIES = 4
+BACKOFF = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# seconds to connect and to wait for each read of a response
+TIMEOUT = (5.0, 30.0)
+
+
+@dataclass(frozen=True, slots=True)
 class Type:
     name: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Move:
     name: str
-    power: int
+    power: Optional[int]
 
 
-@dataclass
-class Pokemon:
-    name: str
-    order: int
-    height: float
-    weight: float
-    types: List[Type]
-    moves: List[Move]
+class Interner:
+    # One shared instance per distinct value, numbered in order of first use.
+    # A crawl sees the same few hundred types and moves on every pokemon, so
+    # records hold the shared instances, or just their ids, instead of copies.
+    # Like sys.intern, entries are never dropped.
 
+    def __init__(self):
+        self.values: list = []
+        self.ids: dict = {}
+        self._lock = threading.Lock()
 
-async def get_json(url: str) -> dict:
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    def id(self, value) -> int:
+        with self._lock:
+            value_id = self.ids.get(value)
+            if value_id is None:
+                value_id = self.ids[value] = len(self.values)
+                self.values.append(value)
+        return value_id
 
+    def intern(self, value):
+        return self.values[self.id(value)]
 
-async def fetch(endpoint: str, name: str) -> List[Pokemon]:
-    url = f"{BASE_URL}/{endpoint}/{name}/"
-    response = requests.get(url)
-    response.raise_for_status()
 
-    data = response.json()
+TYPES = Interner()
+MOVES = Interner()
 
-    pokemon_list = []
 
-    match endpoint:
-        case "type":
-            pokemons_field_name = "pokemon"
-        case "move":
-            pokemons_field_name = "learned_by_pokemon"
+class Pokemon:
+    # Slotted, with interned types and the moves stored as an array of MOVES
+    # ids: four bytes a move instead of an object, for the hundred or so moves
+    # most pokemon learn. `types` and `moves` are tuples, `moves` built on
+    # access, so they change only by assignment, e.g.
+    # `pokemon.moves = [*pokemon.moves, move]`.
+    __slots__ = ("name", "order", "height", "weight", "_types", "_move_ids")
+
+    def __init__(
+        self,
+        name: str,
+        order: int,
+        height: float,
+        weight: float,
+        types: Iterable[Type],
+        moves: Iterable[Move],
+    ):
+        self.name = name
+        self.order = order
+        self.height = height
+        self.weight = weight
+        self.types = types
+        self.moves = moves
+
+    @property
+    def types(self) -> Tuple[Type, ...]:
+        return self._types
+
+    @types.setter
+    def types(self, types: Iterable[Type]):
+        self._types = tuple(map(TYPES.intern, types))
+
+    @property
+    def moves(self) -> Tuple[Move, ...]:
+        moves = MOVES.values
+        return tuple(moves[move_id] for move_id in self._move_ids)
+
+    @moves.setter
+    def moves(self, moves: Iterable[Move]):
+        self._move_ids = array("I", map(MOVES.id, moves))
+
+    def _key(self) -> tuple:
+        return (
+            self.name,
+            self.order,
+            self.height,
+            self.weight,
+            self._types,
+            self._move_ids,
+        )
 
-    for pokemon in data.get(pokemons_field_name, []):
-        types = []
-        moves = []
+    def __eq__(self, other):
+        if not isinstance(other, Pokemon):
+            return NotImplemented
+        return self._key() == other._key()
 
-        if LIMIT > 0 and len(pokemon_list) >= LIMIT:
-            break
+    def __repr__(self) -> str:
+        return (
+            f"Pokemon(name={self.name!r}, order={self.order!r}, "
+            f"height={self.height!r}, weight={self.weight!r}, "
+            f"types={list(self.types)!r}, moves={self.moves!r})"
+        )
 
-        match endpoint:
-            case "type":
-                url = pokemon["pokemon"]["url"]
-            case "move":
-                url = pokemon["url"]
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "order": self.order,
+            "height": self.height,
+            "weight": self.weight,
+            "types": [asdict(type) for type in self.types],
+            "moves": [asdict(move) for move in self.moves],
+        }
+
+
+class OfflineCacheMiss(LookupError):
+    pass
+
+
+def write_atomic(path: Path, *chunks: bytes):
+    # readers see the old file or the new one, never a partial write
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class RateLimiter:
+    # Token bucket shared by the download threads: `rate` tokens a second, up
+    # to `burst` saved up. A caller reserves its token under the lock and
+    # sleeps outside it, so waiters are served in order without holding it.
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
 
-        pokemon_resp = await get_json(url)
 
-        for type in pokemon_resp.get("types", []):
-            type_url = type["type"]["url"]
-            type_resp = await get_json(type_url)
+@dataclass
+class HostStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        mean = self.seconds / self.requests if self.requests else 0.0
+        return (
+            f"{self.requests} requests, {self.retries} retries, "
+            f"{self.failures} failures, mean {mean * 1000:.1f} ms, "
+            f"max {self.max_seconds * 1000:.1f} ms"
+        )
 
-            types.append(Type(name=type_resp.get("name")))
 
-        for move in pokemon_resp.get("moves", []):
-            move_url = move["move"]["url"]
-            move_resp = await get_json(move_url)
+# Seconds to wait before retry number `attempt` (from 0): the server's
+# Retry-After when it sends one, otherwise exponential backoff with full
+# jitter so that concurrent retries spread out.
+def retry_delay(
+    response: Optional[requests.Response],
+    attempt: int,
+    backoff: float = BACKOFF,
+    backoff_max: float = BACKOFF_MAX,
+) -> float:
+    retry_after = response is not None and response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), backoff_max)
+        except ValueError:
+            with contextlib.suppress(TypeError, ValueError):
+                at = parsedate_to_datetime(retry_after).timestamp()
+                return min(max(at - time.time(), 0.0), backoff_max)
+    return random.uniform(0, min(backoff_max, backoff * 2**attempt))
+
+
+class HttpClient:
+    # One keep-alive session whose connection pool fits `concurrency`
+    # downloads, optionally rate limited. Connection errors and RETRY_STATUSES
+    # are retried up to `retries` times; the last response is returned as is
+    # once they run out. A request that can't connect or stalls for longer
+    # than `timeout`, seconds or a (connect, read) pair, counts as a
+    # connection error.
+
+    def __init__(
+        self,
+        concurrency: int = CONCURRENCY,
+        rate: float = RATE,
+        retries: int = RETRIES,
+        backoff: float = BACKOFF,
+        backoff_max: float = BACKOFF_MAX,
+        timeout: Union[float, Tuple[float, float]] = TIMEOUT,
+    ):
+        if retries < 0:
+            raise ValueError("retries must not be negative")
+        if min(timeout if isinstance(timeout, tuple) else (timeout,)) <= 0:
+            raise ValueError("timeout must be positive")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=concurrency, pool_maxsize=concurrency
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.rate_limiter = RateLimiter(rate, concurrency) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.hosts: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, host: str, seconds: float, retry: bool, failed: bool):
+        with self._lock:
+            stats = self.hosts.setdefault(host, HostStats())
+            stats.requests += 1
+            stats.retries += retry
+            stats.failures += failed
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def get(self, url: str, headers: Optional[dict] = None) -> requests.Response:
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            response = error = None
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = exc
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            self._record(host, time.perf_counter() - started, attempt > 0, failed)
+            if not failed or attempt == self.retries:
+                break
+            time.sleep(retry_delay(response, attempt, self.backoff, self.backoff_max))
+        if error is not None:
+            raise error
+        return response
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> str:
+        with self._lock:
+            return "; ".join(f"{host}: {stats}" for host, stats in self.hosts.items())
+
 
-            moves.append(
-                Move(
-                    name=move_resp.get("name"),
-                    power=move_resp.get("power"),
+@dataclass
+class CacheEntry:
+    path: Path
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    body: bytes
+
+    def json(self) -> dict:
+        return json.loads(self.body)
+
+
+class DiskCache:
+    # One file per URL: a single JSON header line followed by the raw response
+    # body. The file's mtime records when the body was last known to be fresh.
+
+    def __init__(self, directory, ttl: float = CACHE_TTL, offline: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.directory / hashlib.sha1(url.encode()).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def load(self, url: str) -> Optional[CacheEntry]:
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+                stored_at = os.fstat(f.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None
+        if header.get("url") != url:
+            return None
+        return CacheEntry(
+            path=path,
+            etag=header.get("etag"),
+            last_modified=header.get("last_modified"),
+            stored_at=stored_at,
+            body=body,
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self.offline or time.time() - entry.stored_at < self.ttl
+
+    def store(self, url: str, response: requests.Response):
+        header = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        write_atomic(
+            self._path(url), json.dumps(header).encode() + b"\n", response.content
+        )
+        self._count("stored")
+
+    def touch(self, entry: CacheEntry):
+        os.utime(entry.path)
+
+    def get(self, url: str, client: HttpClient) -> dict:
+        entry = self.load(url)
+        if entry is not None and self.is_fresh(entry):
+            self._count("hits")
+            return entry.json()
+        if self.offline:
+            raise OfflineCacheMiss(url)
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = client.get(url, headers=headers)
+        if entry is not None and response.status_code == 304:
+            self.touch(entry)
+            self._count("revalidated")
+            return entry.json()
+        response.raise_for_status()
+        self.store(url, response)
+        return response.json()
+
+    def stats(self) -> str:
+        return (
+            f"disk cache: {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.stored} stored"
+        )
+
+
+class Fetcher:
+    def __init__(
+        self,
+        concurrency: int = CONCURRENCY,
+        cache_size: int = CACHE_SIZE,
+        disk_cache: Optional[DiskCache] = None,
+        client: Optional[HttpClient] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if cache_size < 0:
+            raise ValueError("cache_size must not be negative")
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+        self.disk_cache = disk_cache
+        self.client = client or HttpClient(concurrency)
+        self.hits = 0
+        self.misses = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # asyncio.to_thread's default executor has cpu_count + 4 threads, which
+        # would cap the downloads in flight below `concurrency` on small hosts
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="poke_api")
+        # resolved documents, least recently used first
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        # downloads in progress, shared by every caller asking for the same url
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # callers awaiting each download, and the downloads past the semaphore
+        self._waiting: Dict[asyncio.Task, int] = {}
+        self._started: set = set()
+
+    def _get(self, url: str) -> dict:
+        if self.disk_cache is not None:
+            return self.disk_cache.get(url, self.client)
+        response = self.client.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    async def _download(self, url: str, remember: bool) -> dict:
+        task = asyncio.current_task()
+        try:
+            async with self._semaphore:
+                self._started.add(task)
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(self._executor, self._get, url)
+        finally:
+            self._started.discard(task)
+            if self._inflight.get(url) is task:
+                del self._inflight[url]
+
+        if self.cache_size and remember:
+            self._cache[url] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    # Documents only needed once, such as list pages, can skip the memory
+    # cache with `remember=False`.
+    async def get_json(self, url: str, remember: bool = True) -> dict:
+        if url in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(url)
+            return self._cache[url]
+
+        task = self._inflight.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._download(url, remember))
+            self._inflight[url] = task
+        else:
+            self.hits += 1
+
+        # One caller giving up must not cancel the download for the others, but
+        # once all of them have, a download still waiting for the semaphore is
+        # dropped rather than sent. One already sent runs to completion: its
+        # thread cannot be interrupted, and it still holds its semaphore slot.
+        self._waiting[task] = self._waiting.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+                if not task.done() and task not in self._started:
+                    task.cancel()
+                    del self._inflight[url]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+    def stats(self) -> str:
+        stats = f"cache: {self.hits} hits, {self.misses} misses"
+        if self.disk_cache is not None:
+            stats += f"; {self.disk_cache.stats()}"
+        hosts = self.client.stats()
+        if hosts:
+            stats += f"; {hosts}"
+        return stats
+
+
+# `fetcher`, or without one a Fetcher of its own, closed on exit: the
+# functions below take an optional fetcher and must not leak the thread pool
+# and connections of one they made.
+@contextlib.contextmanager
+def use_fetcher(fetcher: Optional[Fetcher] = None) -> Iterator[Fetcher]:
+    if fetcher is not None:
+        yield fetcher
+        return
+    fetcher = Fetcher()
+    try:
+        yield fetcher
+    finally:
+        fetcher.close()
+
+
+async def get_json(url: str, fetcher: Optional[Fetcher] = None) -> dict:
+    with use_fetcher(fetcher) as fetcher:
+        return await fetcher.get_json(url)
+
+
+async def fetch_type(fetcher: Fetcher, url: str) -> Type:
+    type_resp = await fetcher.get_json(url)
+    return TYPES.intern(Type(name=type_resp.get("name")))
+
+
+async def fetch_move(fetcher: Fetcher, url: str) -> Move:
+    move_resp = await fetcher.get_json(url)
+    return MOVES.intern(Move(name=move_resp.get("name"), power=move_resp.get("power")))
+
+
+# Resolves every url with `fetch`, in order. Only the documents neither in the
+# memory cache nor already being downloaded are fetched concurrently here; the
+# rest, most of the types and moves of a crawl, are awaited directly rather
+# than through a task each, which would take more memory than the records
+# they build.
+async def fetch_all(fetcher: Fetcher, fetch, urls: List[str]) -> list:
+    missing = [
+        url
+        for url in dict.fromkeys(urls)
+        if url not in fetcher._cache and url not in fetcher._inflight
+    ]
+    fetched = dict(
+        zip(missing, await asyncio.gather(*(fetch(fetcher, url) for url in missing)))
+    )
+    return [
+        fetched[url] if url in fetched else await fetch(fetcher, url) for url in urls
+    ]
+
+
+async def fetch_pokemon(fetcher: Fetcher, url: str) -> Pokemon:
+    # types and moves are shared between pokemon, pokemon documents are not
+    pokemon_resp = await fetcher.get_json(url, remember=False)
+
+    types, moves = await asyncio.gather(
+        fetch_all(
+            fetcher,
+            fetch_type,
+            [type["type"]["url"] for type in pokemon_resp.get("types", [])],
+        ),
+        fetch_all(
+            fetcher,
+            fetch_move,
+            [move["move"]["url"] for move in pokemon_resp.get("moves", [])],
+        ),
+    )
+
+    return Pokemon(
+        name=pokemon_resp.get("name"),
+        order=pokemon_resp.get("order"),
+        height=pokemon_resp.get("height"),
+        weight=pokemon_resp.get("weight"),
+        types=types,
+        moves=moves,
+    )
+
+
+# The urls of the pokemon listed by a type or move document, skipping the
+# first `offset` and keeping at most `limit` of them (all for 0). Without a
+# `limit`, the module's LIMIT applies.
+def pokemon_urls(
+    endpoint: str, data: dict, limit: Optional[int] = None, offset: int = 0
+) -> List[str]:
+    match endpoint:
+        case "type":
+            urls = [pokemon["pokemon"]["url"] for pokemon in data.get("pokemon", [])]
+        case "move":
+            urls = [pokemon["url"] for pokemon in data.get("learned_by_pokemon", [])]
+        case _:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    if limit is None:
+        limit = LIMIT
+    if offset < 0 or limit < 0:
+        raise ValueError("limit and offset must not be negative")
+    return urls[offset : offset + limit if limit else None]
+
+
+async def fetch(
+    endpoint: str,
+    name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Pokemon]:
+    with use_fetcher(fetcher) as fetcher:
+        data = await fetcher.get_json(f"{BASE_URL}/{endpoint}/{name}/")
+
+        urls = pokemon_urls(endpoint, data, limit, offset)
+        pokemon_list = await asyncio.gather(
+            *(fetch_pokemon(fetcher, url) for url in urls)
+        )
+        return list(pokemon_list)
+
+
+async def stream(
+    endpoint: str,
+    name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> AsyncIterator[Pokemon]:
+    # Yields pokemon in completion order. Only `concurrency` pokemon are being
+    # resolved at any time, so memory does not grow with the size of the crawl.
+    # Closing the generator early, e.g. with contextlib.aclosing, cancels the
+    # pokemon in progress and drops their downloads that were not sent yet.
+    with use_fetcher(fetcher) as fetcher:
+        data = await fetcher.get_json(f"{BASE_URL}/{endpoint}/{name}/")
+
+        urls = iter(pokemon_urls(endpoint, data, limit, offset))
+        pending = set()
+        try:
+            while True:
+                for url in urls:
+                    pending.add(asyncio.ensure_future(fetch_pokemon(fetcher, url)))
+                    if len(pending) >= fetcher.concurrency:
+                        break
+                if not pending:
+                    return
+
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
                 )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class Checkpoint:
+    # Progress of a full-catalog crawl: the list page to resume from, saved
+    # after every page the consumer is done with and removed once the crawl
+    # completes. A crash redoes at most one page.
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.start: Optional[str] = None
+        self.next_page: Optional[str] = None
+        self.pages = 0
+        self.pokemon = 0
+        try:
+            state = json.loads(self.path.read_bytes())
+        except (OSError, ValueError):
+            return
+        self.start = state.get("start")
+        self.next_page = state.get("next_page")
+        self.pages = state.get("pages", 0)
+        self.pokemon = state.get("pokemon", 0)
+
+    def resume_from(self, start: str) -> str:
+        # a checkpoint of another crawl, e.g. with another page size, is ignored
+        if self.start == start and self.next_page:
+            return self.next_page
+        self.start, self.next_page, self.pages, self.pokemon = start, None, 0, 0
+        return start
+
+    def advance(self, next_page: Optional[str], pokemon: int):
+        self.next_page = next_page
+        self.pages += 1
+        self.pokemon += pokemon
+        state = {
+            "start": self.start,
+            "next_page": self.next_page,
+            "pages": self.pages,
+            "pokemon": self.pokemon,
+        }
+        write_atomic(self.path, json.dumps(state).encode())
+
+    def clear(self):
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+
+async def crawl_pages(
+    fetcher: Optional[Fetcher] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    page_size: int = PAGE_SIZE,
+) -> AsyncIterator[List[Pokemon]]:
+    # Walks the paginated pokemon list and yields the pokemon of each page.
+    # With a `checkpoint`, a page is recorded as done when the next one is
+    # requested, and an interrupted crawl resumes at the first page not done.
+    # Run with a DiskCache, unchanged documents are revalidated rather than
+    # downloaded again.
+    url = f"{BASE_URL}/pokemon/?limit={page_size}&offset=0"
+    if checkpoint is not None:
+        url = checkpoint.resume_from(url)
+
+    with use_fetcher(fetcher) as fetcher:
+        while url:
+            page = await fetcher.get_json(url, remember=False)
+            pokemon_list = await asyncio.gather(
+                *(fetch_pokemon(fetcher, result["url"]) for result in page["results"])
             )
+            yield list(pokemon_list)
+            url = page.get("next")
+            if checkpoint is not None:
+                checkpoint.advance(url, len(pokemon_list))
+
+    if checkpoint is not None:
+        checkpoint.clear()
 
-        pokemon = Pokemon(
-            name=data.get("name"),
-            order=data.get("order"),
-            height=data.get("height"),
-            weight=data.get("weight"),
-            types=types,
-            moves=moves,
-        )
 
-        pokemon_list.append(pokemon)
+async def get_pokemon_by_type(
+    type_name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Pokemon]:
+    return await fetch("type", type_name, fetcher, limit, offset)
 
-    return pokemon_list
 
+async def get_pokemon_by_move(
+    move_name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Pokemon]:
+    return await fetch("move", move_name, fetcher, limit, offset)
 
-async def get_pokemon_by_type(type_name: str) -> List[Pokemon]:
-    return await fetch("type", type_name)
 
+# Async generator counterparts of get_pokemon_by_type and get_pokemon_by_move,
+# yielding each pokemon as soon as it is resolved (see stream).
+def iter_pokemon_by_type(
+    type_name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> AsyncIterator[Pokemon]:
+    return stream("type", type_name, fetcher, limit, offset)
 
-async def get_pokemon_by_move(move_name: str) -> List[Pokemon]:
-    return await fetch("move", move_name)
+
+def iter_pokemon_by_move(
+    move_name: str,
+    fetcher: Optional[Fetcher] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> AsyncIterator[Pokemon]:
+    return stream("move", move_name, fetcher, limit, offset)
 
 
 @dataclass
 class Arguments:
     type: str
     move: str
+    concurrency: int
+    cache_size: int
+    cache_dir: Optional[str]
+    cache_ttl: float
+    offline: bool
+    format: Optional[str]
+    all: bool
+    checkpoint: Optional[str]
+    page_size: int
+    rate: float
+    retries: int
+    timeout: Optional[float]
+    limit: int
+    offset: int
+    base_url: str
 
 
 async def main():
+    global BASE_URL
     parser = argparse.ArgumentParser()
     # type and move are mutually exclusive
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--type", type=str)
     group.add_argument("--move", type=str)
+    group.add_argument(
+        "--all", action="store_true", help="crawl every pokemon, page by page"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="file recording the progress of --all, to resume an interrupted crawl",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=PAGE_SIZE,
+        help="pokemon per list page with --all",
+    )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=os.environ.get("POKE_API_BASE_URL", BASE_URL),
+        help="API to crawl, e.g. a local poke_api_standin.py",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help="maximum number of requests in flight",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=LIMIT,
+        help="maximum number of pokemon of the type or move, 0 for all",
+    )
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="number of pokemon of the type or move to skip",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=RATE,
+        help="maximum requests per second, 0 for no limit",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RETRIES,
+        help="retries of a request failing with a connection error, 429 or 5xx",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="seconds to connect and to wait for each read of a response "
+        "(default %s and %s)" % TIMEOUT,
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_SIZE,
+        help="maximum number of resolved documents kept in memory",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=os.environ.get("POKE_API_CACHE_DIR"),
+        help="directory for the persistent response cache",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=CACHE_TTL,
+        help="seconds a cached response is used before it is revalidated",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="serve responses from the persistent cache only",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        help="ndjson writes each pokemon as soon as it is resolved (default "
+        "json, and ndjson with --all)",
+    )
     args = Arguments(**vars(parser.parse_args()))
 
+    if args.offline and not args.cache_dir:
+        parser.error("--offline requires --cache-dir")
+    BASE_URL = args.base_url.rstrip("/")
+    if args.checkpoint and not args.all:
+        parser.error("--checkpoint requires --all")
+    # the catalog is too large to hold, so pages are written out as ndjson
+    if args.all and args.format == "json":
+        parser.error("--all writes ndjson, not --format json")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("--timeout must be positive")
+
+    disk_cache = None
+    if args.cache_dir:
+        disk_cache = DiskCache(args.cache_dir, ttl=args.cache_ttl, offline=args.offline)
+
+    client = HttpClient(
+        args.concurrency,
+        rate=args.rate,
+        retries=args.retries,
+        timeout=args.timeout or TIMEOUT,
+    )
+    fetcher = Fetcher(args.concurrency, args.cache_size, disk_cache, client)
+    try:
+        await write_pokemon(args, fetcher)
+    finally:
+        fetcher.close()
+    print(fetcher.stats(), file=sys.stderr)
+
+
+async def write_pokemon(args: Arguments, fetcher: Fetcher):
+    if args.all:
+        checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+        async for pokemon_list in crawl_pages(fetcher, checkpoint, args.page_size):
+            for pokemon in pokemon_list:
+                sys.stdout.write(json.dumps(pokemon.as_dict()) + "\n")
+            sys.stdout.flush()
+        return
+
     if args.type:
-        pokemon_list = await get_pokemon_by_type(args.type)
+        endpoint, name = "type", args.type
     elif args.move:
-        pokemon_list = await get_pokemon_by_move(args.move)
+        endpoint, name = "move", args.move
     else:
         raise ValueError("Invalid arguments")
 
-    pokemon_list = [pokemon.__dict__ for pokemon in pokemon_list]
-    for pokemon in pokemon_list:
-        pokemon["types"] = [type.__dict__ for type in pokemon["types"]]
-        pokemon["moves"] = [move.__dict__ for move in pokemon["moves"]]
-
-    print(json.dumps(pokemon_list, indent=2))
+    if args.format == "ndjson":
+        pokemon_stream = stream(endpoint, name, fetcher, args.limit, args.offset)
+        async for pokemon in pokemon_stream:
+            sys.stdout.write(json.dumps(pokemon.as_dict()) + "\n")
+            sys.stdout.flush()
+    else:
+        pokemon_list = await fetch(endpoint, name, fetcher, args.limit, args.offset)
+        pokemon_list = [pokemon.as_dict() for pokemon in pokemon_list]
+        print(json.dumps(pokemon_list, indent=2))
 
 
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    asyncio.run(main())
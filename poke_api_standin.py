@@ -0,0 +1,385 @@
+import argparse
+import functools
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import poke_api
+
+# a synthetic catalog about the size of PokeAPI's
+POKEMON = 1300
+MOVES = 900
+TYPES = 18
+MOVES_PER_POKEMON = 80
+SEED = 0
+
+
+class SyntheticCatalog:
+    # Deterministic PokeAPI-shaped documents, generated on request so that the
+    # catalog takes no memory up front. Types and moves are found by id or by
+    # name ("type-3", "move-42"); the pokemon listed by each are worked out
+    # from every pokemon the first time one is asked for.
+
+    def __init__(
+        self,
+        pokemon: int = POKEMON,
+        moves: int = MOVES,
+        moves_per_pokemon: int = MOVES_PER_POKEMON,
+        seed: int = SEED,
+    ):
+        self.pokemon = pokemon
+        self.moves = moves
+        self.moves_per_pokemon = min(moves_per_pokemon, moves)
+        self.seed = seed
+
+    def _pokemon(self, key: int) -> dict:
+        rng = random.Random(f"{self.seed}-{key}")
+        return {
+            "types": rng.sample(range(TYPES), rng.choice((1, 2))),
+            "moves": sorted(rng.sample(range(self.moves), self.moves_per_pokemon)),
+            "height": rng.randint(1, 200),
+            "weight": rng.randint(1, 10000),
+        }
+
+    @functools.cached_property
+    def _learned_by(self) -> Dict[str, List[List[int]]]:
+        learned_by = {"type": [[] for _ in range(TYPES)]}
+        learned_by["move"] = [[] for _ in range(self.moves)]
+        for key in range(self.pokemon):
+            pokemon = self._pokemon(key)
+            for kind in ("type", "move"):
+                for linked in pokemon[f"{kind}s"]:
+                    learned_by[kind][linked].append(key)
+        return learned_by
+
+    def _url(self, base_url: str, kind: str, key: int) -> str:
+        return f"{base_url}/{kind}/{key}/"
+
+    def _id(self, kind: str, key: str, count: int) -> Optional[int]:
+        key = key.removeprefix(f"{kind}-")
+        if key.isdigit() and int(key) < count:
+            return int(key)
+        return None
+
+    def data(self, base_url: str, path: str) -> Optional[dict]:
+        parts = urlsplit(path)
+        kind, _, key = parts.path.strip("/").partition("/")
+        url = functools.partial(self._url, base_url)
+
+        if kind == "pokemon" and not key:
+            query = parse_qs(parts.query)
+            limit = int(query.get("limit", [poke_api.PAGE_SIZE])[0])
+            offset = int(query.get("offset", [0])[0])
+            end = min(offset + limit, self.pokemon)
+            return {
+                "count": self.pokemon,
+                "next": (
+                    f"{base_url}/pokemon/?limit={limit}&offset={end}"
+                    if end < self.pokemon
+                    else None
+                ),
+                "results": [
+                    {"name": f"pokemon-{i}", "url": url("pokemon", i)}
+                    for i in range(offset, end)
+                ],
+            }
+        if (
+            kind == "pokemon"
+            and (key_id := self._id(kind, key, self.pokemon)) is not None
+        ):
+            pokemon = self._pokemon(key_id)
+            return {
+                "name": f"pokemon-{key_id}",
+                "order": key_id,
+                "height": pokemon["height"],
+                "weight": pokemon["weight"],
+                "types": [{"type": {"url": url("type", i)}} for i in pokemon["types"]],
+                "moves": [{"move": {"url": url("move", i)}} for i in pokemon["moves"]],
+            }
+        if kind == "type" and (key_id := self._id(kind, key, TYPES)) is not None:
+            return {
+                "name": f"type-{key_id}",
+                "pokemon": [
+                    {"pokemon": {"url": url("pokemon", i)}}
+                    for i in self._learned_by["type"][key_id]
+                ],
+            }
+        if kind == "move" and (key_id := self._id(kind, key, self.moves)) is not None:
+            rng = random.Random(f"{self.seed}-move-{key_id}")
+            return {
+                "name": f"move-{key_id}",
+                "power": rng.choice([None, 40, 60, 90]),
+                "learned_by_pokemon": [
+                    {"url": url("pokemon", i)} for i in self._learned_by["move"][key_id]
+                ],
+            }
+        return None
+
+    def document(self, base_url: str, path: str) -> Optional[bytes]:
+        data = self.data(base_url, path)
+        return None if data is None else json.dumps(data).encode()
+
+
+class RecordedCorpus:
+    # Replays a poke_api.DiskCache directory filled by a real crawl, e.g.
+    #   python poke_api.py --type fire --limit 0 --cache-dir corpus/
+    # Urls in the recorded documents are rewritten to point at the stand-in.
+
+    def __init__(self, directory, recorded_base: str = poke_api.BASE_URL):
+        base = urlsplit(recorded_base)
+        prefix = base.path.rstrip("/")
+        # documents link to each other with https urls whatever the base's scheme
+        self.pattern = re.compile(
+            rb"https?://" + re.escape(f"{base.netloc}{prefix}".encode())
+        )
+        # request path and query -> cache file
+        self.paths: Dict[str, Path] = {}
+        for path in Path(directory).iterdir():
+            if path.name.startswith(".tmp-") or not path.is_file():
+                continue
+            with open(path, "rb") as f:
+                url = urlsplit(json.loads(f.readline()).get("url", ""))
+            if url.netloc != base.netloc or not url.path.startswith(f"{prefix}/"):
+                continue
+            request = url.path[len(prefix) :]
+            if url.query:
+                request += f"?{url.query}"
+            self.paths[request] = path
+        if not self.paths:
+            raise ValueError(
+                f"No documents recorded from {recorded_base} in {directory}"
+            )
+
+    def document(self, base_url: str, path: str) -> Optional[bytes]:
+        cached = self.paths.get(path)
+        if cached is None:
+            return None
+        with open(cached, "rb") as f:
+            f.readline()
+            body = f.read()
+        return self.pattern.sub(base_url.encode(), body)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # keep-alive like the real API, so that connection reuse can be measured
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def send_body(self, status: int, body: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_fault(self, status: int, retry_after: Optional[str] = None):
+        headers = {"Retry-After": retry_after} if retry_after else {}
+        self.send_body(status, b"{}", headers)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            # statuses to answer with, in order, before serving the document
+            faults = server.faults.get(self.path)
+            fault = faults.pop(0) if faults else None
+            delay = server.latency + server.random.uniform(0, server.jitter)
+            failed = server.random.random() < server.error_rate
+        try:
+            wait = server.throttle()
+            if wait is not None:
+                self.send_fault(429, f"{wait:.3f}")
+                return
+            time.sleep(delay)
+            if fault is not None:
+                retry_after = server.retry_after if fault == 429 else None
+                self.send_fault(fault, retry_after)
+                return
+            if failed:
+                server.count("errors")
+                self.send_fault(503)
+                return
+
+            body = server.corpus.document(server.base_url, self.path)
+            if body is None:
+                self.send_fault(404)
+                return
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_body(200, body, {"ETag": etag})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class StandInServer(ThreadingHTTPServer):
+    # A local PokeAPI serving `corpus`, a SyntheticCatalog or RecordedCorpus,
+    # at `base_url`. Every response is delayed by `latency` plus up to
+    # `jitter` seconds; `error_rate` of them fail with a 503, and beyond
+    # `rate` requests a second (0 for no limit) they are answered with a 429
+    # and the Retry-After of the next free slot.
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        corpus,
+        address=("127.0.0.1", 0),
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(address, StandInHandler)
+        self.corpus = corpus
+        self.base_url = f"http://{self.server_address[0]}:{self.server_port}"
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.errors = 0
+        self.throttled = 0
+        # per request path, statuses to answer with before serving it
+        self.faults: Dict[str, List[int]] = {}
+        # Retry-After sent with 429 faults
+        self.retry_after: Optional[str] = None
+        self._tokens = max(rate, 1.0)
+        self._updated = time.monotonic()
+
+    def count(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # Takes a token of the rate limit, or returns the seconds until there is one.
+    def throttle(self) -> Optional[float]:
+        if not self.rate:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(
+                max(self.rate, 1.0), self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            self.throttled += 1
+            return (1 - self._tokens) / self.rate
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "served": sum(self.requests.values()),
+                "connections": self.connections,
+                "errors": self.errors,
+                "throttled": self.throttled,
+            }
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="DiskCache directory recorded by poke_api.py --cache-dir, "
+        "instead of the synthetic catalog",
+    )
+    parser.add_argument(
+        "--recorded-base",
+        type=str,
+        default=poke_api.BASE_URL,
+        help="base url the corpus was recorded from",
+    )
+    parser.add_argument("--pokemon", type=int, default=POKEMON)
+    parser.add_argument("--moves", type=int, default=MOVES)
+    parser.add_argument("--moves-per-pokemon", type=int, default=MOVES_PER_POKEMON)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of 503 responses"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="requests per second, 0 for no limit"
+    )
+
+
+def from_arguments(args, address=("127.0.0.1", 0)) -> StandInServer:
+    if args.corpus:
+        corpus = RecordedCorpus(args.corpus, args.recorded_base)
+    else:
+        corpus = SyntheticCatalog(
+            args.pokemon, args.moves, args.moves_per_pokemon, args.seed
+        )
+    return StandInServer(
+        corpus,
+        address,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate=args.rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for PokeAPI; point poke_api.py at "
+        "it with --base-url."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = from_arguments(args, (args.host, args.port))
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "pokemons.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,6 +86,62 @@ DATABASES = {
     }
 }
 
+# Run on every new sqlite connection of a database that lists them under
+# "PRAGMAS" (see pokemons.db). WAL lets readers run alongside a writer, and
+# "normal" sync is safe with it; mmap_size and cache_size (negative is KiB)
+# keep more of the database in memory.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "memory",
+}
+
+# POKEMONS_DB_PROFILE=production keeps connections open between requests,
+# waits up to 20 seconds for locks instead of failing with "database is
+# locked", and reads through a second, read-only connection to the same file.
+if os.environ.get("POKEMONS_DB_PROFILE") == "production":
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"timeout": 20},
+            "PRAGMAS": SQLITE_PRAGMAS,
+        }
+    )
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": f"file:{DATABASES['default']['NAME']}?mode=ro",
+        "PRAGMAS": {
+            name: value
+            for name, value in SQLITE_PRAGMAS.items()
+            if name != "journal_mode"
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["pokemons.db.ReadReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# Holds the rendered responses of the read endpoints (see pokemons.cache).
+# Swap the backend for a shared one when running several workers, e.g.
+# "django.core.cache.backends.filebased.FileBasedCache" with a LOCATION
+# directory, or "django.core.cache.backends.redis.RedisCache" with
+# "redis://127.0.0.1:6379".
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+POKEMONS_CACHE_ALIAS = "default"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,6 +185,10 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_RENDERER_CLASSES": [
+        "pokemons.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "pokemons.pagination.PageNumberOrKeysetPagination",
     "PAGE_SIZE": 10,
 }
@@ -0,0 +1,131 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .models import Pokemon
+from .projections import (
+    columns,
+    exact_floats,
+    float_columns,
+    project,
+    requested_fields,
+)
+from .renderers import FastJSONRenderer
+from .serializers import (
+    MoveSerializer,
+    PokemonSerializer,
+    SimilarPokemonSerializer,
+    SimilarQuerySerializer,
+)
+from .similarity import rank, ranked_candidates, similar_queryset
+from .views import PokemonDetailView, PokemonListView
+
+# Native async counterparts of the read-only pokemon views, for ASGI servers.
+# They reuse the sync views' querysets, filters, pagination and serializers,
+# so responses are the same as those of the DRF views, but every query runs
+# through the async ORM instead of holding a worker thread for the request.
+
+
+# Renders `data` like the DRF views' default renderer.
+def render(data, status=200, renderer_context=None):
+    content = FastJSONRenderer().render(data, renderer_context=renderer_context)
+    return HttpResponse(content, status=status, content_type="application/json")
+
+
+def not_found(detail):
+    return render({"detail": detail}, status=404)
+
+
+def only_get(view):
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+
+    return wrapped
+
+
+async def paginate(paginator, queryset, request):
+    # PageNumberPagination.paginate_queryset, with the count and the page
+    # fetched through the async ORM
+    django_paginator = paginator.django_paginator_class(
+        queryset, paginator.get_page_size(request)
+    )
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    page = django_paginator.page(page_number)
+    page.object_list = [obj async for obj in page.object_list]
+    paginator.page = page
+    paginator.request = request
+    return list(page)
+
+
+# ProjectedListMixin.list, rendered like the sync list
+@only_get
+async def pokemon_list(request):
+    view = PokemonListView(request=Request(request), format_kwarg=None)
+    try:
+        fields = requested_fields(view.request, PokemonSerializer.Meta.fields)
+        queryset = view.filter_queryset(view.get_queryset())
+    except ValidationError as exc:
+        return render(exc.detail, status=400)
+    values = columns(fields, view.projections)
+    queryset = queryset.prefetch_related(None).values(*dict.fromkeys(["id", *values]))
+
+    paginator = view.paginator
+    if paginator.keyset_class.cursor_query_param in request.GET:
+        page = await sync_to_async(paginator.paginate_queryset)(
+            queryset, view.request, view
+        )
+    else:
+        try:
+            page = await paginate(paginator, queryset, view.request)
+        except InvalidPage:
+            return not_found("Invalid page.")
+
+    renderer_context = {
+        "exact_floats": exact_floats(page, float_columns(queryset.model, values))
+    }
+    data = await sync_to_async(project)(page, fields, view.projections)
+    return render(
+        paginator.get_paginated_response(data).data, renderer_context=renderer_context
+    )
+
+
+@only_get
+async def pokemon_detail(request, pk):
+    pokemon = await PokemonDetailView.queryset.filter(pk=pk).afirst()
+    if pokemon is None:
+        return not_found("No Pokemon matches the given query.")
+    return render(PokemonSerializer(pokemon).data)
+
+
+@only_get
+async def pokemon_best_move(request, pk):
+    pokemon = await Pokemon.objects.select_related("best_move").filter(id=pk).afirst()
+    if pokemon is None:
+        return not_found("Pokemon not found.")
+    if pokemon.best_move is None:
+        return not_found("No moves available for this Pokemon.")
+    return render(MoveSerializer(pokemon.best_move).data)
+
+
+@only_get
+async def pokemon_similar(request, pk):
+    pokemon = await Pokemon.objects.filter(id=pk).afirst()
+    if pokemon is None:
+        return not_found("Pokemon not found.")
+
+    query = SimilarQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return render(query.errors, status=400)
+
+    ranked = await sync_to_async(ranked_candidates)(pokemon, **query.validated_data)
+    pokemons = [similar async for similar in similar_queryset(ranked)]
+    serializer = SimilarPokemonSerializer(rank(pokemons, ranked), many=True)
+    return render(serializer.data)
@@ -0,0 +1,125 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+HOST = "localhost"
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    index = min(len(samples) - 1, max(0, round(q / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+# Summarizes request latencies (in seconds) measured over `elapsed` seconds.
+def summarize(latencies, elapsed, errors=0):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def wsgi_environ(url):
+    parts = urlsplit(url)
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": parts.path,
+        "QUERY_STRING": parts.query,
+        "SERVER_NAME": HOST,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": HOST,
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+
+# Drives a WSGI application the way a threaded server would: `concurrency`
+# worker threads each handling one request at a time.
+def run_wsgi(application, urls, concurrency):
+    def call(url):
+        status = []
+        started = time.perf_counter()
+        body = application(wsgi_environ(url), lambda s, headers: status.append(s))
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        return time.perf_counter() - started, not status[0].startswith("200")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, urls))
+    elapsed = time.perf_counter() - started
+    return summarize(
+        [latency for latency, _ in results],
+        elapsed,
+        sum(error for _, error in results),
+    )
+
+
+def asgi_scope(url):
+    parts = urlsplit(url)
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode()), (b"accept", b"application/json")],
+        "server": (HOST, 80),
+        "client": ("127.0.0.1", 0),
+    }
+
+
+# Drives an ASGI application from a single event loop with at most
+# `concurrency` requests in flight.
+def run_asgi(application, urls, concurrency):
+    async def call(semaphore, url):
+        status = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await application(asgi_scope(url), receive, send)
+            return time.perf_counter() - started, status[0] != 200
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(semaphore, url) for url in urls))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    return summarize(
+        [latency for latency, _ in results],
+        elapsed,
+        sum(error for _, error in results),
+    )
@@ -0,0 +1,292 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Set, Tuple
+
+from django.db import transaction
+
+from . import search, stats
+from .cache import bump_version
+from .models import Pokemon, PokemonType, Move
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class SyncResult:
+    created: Dict[str, int] = field(default_factory=dict)
+    updated: Dict[str, int] = field(default_factory=dict)
+    links_added: int = 0
+    links_removed: int = 0
+
+    def count(self, name, created=0, updated=0):
+        self.created[name] = self.created.get(name, 0) + created
+        self.updated[name] = self.updated.get(name, 0) + updated
+
+    def merge(self, other: "SyncResult"):
+        for name in other.created:
+            self.count(name, other.created[name], other.updated[name])
+        self.links_added += other.links_added
+        self.links_removed += other.links_removed
+
+    @property
+    def changed(self):
+        return bool(
+            any(self.created.values())
+            or any(self.updated.values())
+            or self.links_added
+            or self.links_removed
+        )
+
+    def __str__(self):
+        counts = ", ".join(
+            f"{name}: {self.created.get(name, 0)} created, "
+            f"{self.updated.get(name, 0)} updated"
+            for name in ["types", "moves", "pokemons"]
+        )
+        return (
+            f"{counts}; links: {self.links_added} added, "
+            f"{self.links_removed} removed"
+        )
+
+
+# Creates or updates `rows`, keyed on the unique `key` field, and returns a
+# `{key: id}` map with the keys of the rows created and updated. Rows whose
+# stored values already match are not written.
+def upsert(model, key: str, rows: Dict[str, dict], batch_size=BATCH_SIZE):
+    existing = {
+        getattr(obj, key): obj
+        for obj in model.objects.filter(**{f"{key}__in": list(rows)})
+    }
+
+    to_create = [
+        model(**{key: value}, **fields)
+        for value, fields in rows.items()
+        if value not in existing
+    ]
+    to_update = []
+    update_fields = set()
+    for value, fields in rows.items():
+        obj = existing.get(value)
+        if obj is None:
+            continue
+        changed = [name for name, v in fields.items() if getattr(obj, name) != v]
+        if changed:
+            for name in changed:
+                setattr(obj, name, fields[name])
+            update_fields.update(changed)
+            to_update.append(obj)
+
+    model.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        model.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+
+    ids = {value: obj.pk for value, obj in existing.items()}
+    if to_create:
+        # bulk_create only sets primary keys where the backend supports RETURNING
+        ids.update(
+            model.objects.filter(
+                **{f"{key}__in": [getattr(obj, key) for obj in to_create]}
+            ).values_list(key, "pk")
+        )
+    return (
+        ids,
+        [getattr(obj, key) for obj in to_create],
+        [getattr(obj, key) for obj in to_update],
+    )
+
+
+# Makes the through table rows of `pokemon_ids` equal to `links`, a set of
+# `(pokemon_id, source_id)` pairs, touching only the rows that differ, and
+# returns the added and removed pairs.
+def sync_links(
+    through, source: str, pokemon_ids: Iterable[int], links: Set[Tuple[int, int]]
+):
+    source_field = f"{source}_id"
+    existing = set(
+        through.objects.filter(pokemon_id__in=list(pokemon_ids)).values_list(
+            "pokemon_id", source_field
+        )
+    )
+
+    added = links - existing
+    removed = existing - links
+    through.objects.bulk_create(
+        [
+            through(pokemon_id=pokemon_id, **{source_field: source_id})
+            for pokemon_id, source_id in added
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    stale = {}
+    for pokemon_id, source_id in removed:
+        stale.setdefault(pokemon_id, []).append(source_id)
+    for pokemon_id, source_ids in stale.items():
+        through.objects.filter(
+            pokemon_id=pokemon_id, **{f"{source_field}__in": source_ids}
+        ).delete()
+    return added, removed
+
+
+def _save_types(names, result: SyncResult, batch_size=BATCH_SIZE):
+    rows = {name: {} for name in names}
+    ids, created, updated = upsert(PokemonType, "type", rows, batch_size)
+    result.count("types", len(created), len(updated))
+    if created:
+        stats.refresh_types([ids[name] for name in created])
+    return ids
+
+
+def _save_moves(rows: Dict[str, dict], result: SyncResult, batch_size=BATCH_SIZE):
+    ids, created, repowered = upsert(Move, "name", rows, batch_size)
+    result.count("moves", len(created), len(repowered))
+    if created:
+        stats.refresh_moves([ids[name] for name in created])
+
+    # bulk_update bypasses the post_save handler that tracks best moves
+    if repowered:
+        repowered_ids = [ids[name] for name in repowered]
+        pokemon_ids = Pokemon.objects.filter(moves__in=repowered_ids).values("pk")
+        Pokemon.objects.filter(pk__in=pokemon_ids).refresh_move_summary()
+        stats.refresh_types_of_moves(repowered_ids)
+    return ids
+
+
+# `types` and `moves` map pokemon names to the names of their types and moves.
+# Pokemon missing from either map keep their current membership. Types are
+# created as needed; moves must already exist, and `move_ids` may carry ids
+# that are already known.
+def _save_pokemon(
+    rows: Dict[str, dict],
+    types: Dict[str, Iterable[str]],
+    moves: Dict[str, Iterable[str]],
+    result: SyncResult,
+    batch_size=BATCH_SIZE,
+    move_ids=None,
+):
+    type_ids = _save_types(
+        {type for names in types.values() for type in names}, result, batch_size
+    )
+
+    move_ids = dict(move_ids or {})
+    move_names = {move for names in moves.values() for move in names}
+    if move_names - move_ids.keys():
+        move_ids.update(
+            Move.objects.filter(name__in=move_names - move_ids.keys()).values_list(
+                "name", "pk"
+            )
+        )
+    if move_names - move_ids.keys():
+        raise Move.DoesNotExist(
+            "Unknown moves: %s" % ", ".join(sorted(move_names - move_ids.keys()))
+        )
+
+    pokemon_ids, created, updated = upsert(Pokemon, "name", rows, batch_size)
+    result.count("pokemons", len(created), len(updated))
+
+    unindexed = {pokemon_ids[name] for name in created}
+    moves_changed = set()
+    linked_changed = {}
+    # the through table writes bypass the m2m_changed handlers, so the link
+    # changes are applied to the type stats here, types first as they are
+    # written first
+    for through, source, members, ids, links_changed in [
+        (
+            PokemonType.pokemons.through,
+            "pokemontype",
+            types,
+            type_ids,
+            stats.type_links_changed,
+        ),
+        (Move.pokemons.through, "move", moves, move_ids, stats.move_links_changed),
+    ]:
+        if not members:
+            continue
+        links = {
+            (pokemon_ids[name], ids[member])
+            for name, names in members.items()
+            for member in names
+        }
+        added, removed = sync_links(
+            through, source, [pokemon_ids[name] for name in members], links
+        )
+        links_changed(added, removed)
+        result.links_added += len(added)
+        result.links_removed += len(removed)
+        changed = {pokemon_id for pokemon_id, _ in added | removed}
+        unindexed |= changed
+        linked_changed[source] = {source_id for _, source_id in added | removed}
+        if through is Move.pokemons.through:
+            moves_changed = changed
+
+    if moves_changed:
+        Pokemon.objects.filter(pk__in=moves_changed).refresh_move_summary()
+        stats.refresh_moves(linked_changed["move"])
+    search.reindex(unindexed)
+    return pokemon_ids
+
+
+@transaction.atomic
+def save_types(names, batch_size=BATCH_SIZE):
+    result = SyncResult()
+    ids = _save_types(names, result, batch_size)
+    if result.changed:
+        bump_version()
+    return ids, result
+
+
+@transaction.atomic
+def save_moves(rows: Dict[str, dict], batch_size=BATCH_SIZE):
+    result = SyncResult()
+    ids = _save_moves(rows, result, batch_size)
+    if result.changed:
+        bump_version()
+    return ids, result
+
+
+@transaction.atomic
+def save_pokemon(rows, types=None, moves=None, batch_size=BATCH_SIZE):
+    result = SyncResult()
+    ids = _save_pokemon(rows, types or {}, moves or {}, result, batch_size)
+    if result.changed:
+        bump_version()
+    return ids, result
+
+
+# Upserts crawled `poke_api.Pokemon` records with their types and moves, and
+# replaces the type and move membership of every synced pokemon.
+@transaction.atomic
+def sync_pokemon(pokemon_list, batch_size=BATCH_SIZE) -> SyncResult:
+    pokemons = {pokemon.name: pokemon for pokemon in pokemon_list}
+    result = SyncResult()
+
+    move_rows = {
+        move.name: {"power": move.power or 0}
+        for pokemon in pokemons.values()
+        for move in pokemon.moves
+    }
+    move_ids = _save_moves(move_rows, result, batch_size)
+
+    _save_pokemon(
+        {
+            name: {
+                "order": pokemon.order,
+                "height": pokemon.height,
+                "weight": pokemon.weight,
+            }
+            for name, pokemon in pokemons.items()
+        },
+        types={
+            name: [type.name for type in pokemon.types]
+            for name, pokemon in pokemons.items()
+        },
+        moves={
+            name: [move.name for move in pokemon.moves]
+            for name, pokemon in pokemons.items()
+        },
+        result=result,
+        batch_size=batch_size,
+        move_ids=move_ids,
+    )
+    if result.changed:
+        bump_version()
+    return result
@@ -0,0 +1,133 @@
+import functools
+import hashlib
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import has_vary_header, patch_vary_headers
+
+from . import metrics
+
+VERSION_KEY = "pokemons:version"
+CACHED_HEADERS = ["Content-Type", "Vary", "Allow"]
+
+# per url name: hits, misses and the seconds spent serving each, updated
+# under metrics.lock
+stats = defaultdict(
+    lambda: {"hits": 0, "misses": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+)
+
+
+def get_cache():
+    return caches[getattr(settings, "POKEMONS_CACHE_ALIAS", "default")]
+
+
+# A version the key can never have held before, for when it is missing: the
+# cache may have evicted it, and starting over at a fixed value would bring
+# back responses stored under that value's earlier life.
+def new_version():
+    return time.time_ns()
+
+
+def get_version():
+    return get_cache().get_or_set(VERSION_KEY, new_version, timeout=None)
+
+
+def _bump_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, new_version(), timeout=None)
+
+
+# Invalidates every cached response. Bumped right away for the writing
+# request and again on commit, so a response rendered by a concurrent reader
+# before the commit is not kept under the new version.
+def bump_version():
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def make_etag(content):
+    return '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+def if_none_match(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+# Whether a rendered response can be served to other clients. The browsable
+# API's HTML embeds the requesting client's CSRF token and username, and
+# anything that sets a cookie or varies on it is per client too.
+def is_shareable(request, response):
+    renderer = getattr(response, "accepted_renderer", None)
+    return (
+        response.status_code == 200
+        and not (renderer and renderer.media_type.startswith("text/html"))
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        and not response.cookies
+        and not has_vary_header(response, "Cookie")
+    )
+
+
+def cache_response(view):
+    # Caches shareable GET responses of `view`, keyed on the data version,
+    # the full path and the Accept header, and answers matching If-None-Match
+    # requests with 304 Not Modified.
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+
+        started = time.perf_counter()
+        cache = get_cache()
+        key = "pokemons:response:%s:%s" % (
+            get_version(),
+            hashlib.sha1(
+                f"{request.get_full_path()}\n{request.headers.get('Accept', '')}".encode()
+            ).hexdigest(),
+        )
+
+        response = None
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                metrics.render(request, response)
+            if not is_shareable(request, response):
+                return response
+            entry = {
+                "content": response.content,
+                "etag": make_etag(response.content),
+                "headers": {
+                    name: response[name] for name in CACHED_HEADERS if name in response
+                },
+            }
+            cache.set(key, entry)
+            hit = False
+        else:
+            hit = True
+
+        if if_none_match(request, entry["etag"]):
+            response = HttpResponseNotModified()
+        elif response is None:
+            response = HttpResponse(entry["content"])
+            for name, value in entry["headers"].items():
+                response[name] = value
+        response["ETag"] = entry["etag"]
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        patch_vary_headers(response, ["Accept"])
+
+        elapsed = time.perf_counter() - started
+        with metrics.lock:
+            endpoint = stats[request.resolver_match.url_name]
+            endpoint["hits" if hit else "misses"] += 1
+            endpoint["hit_seconds" if hit else "miss_seconds"] += elapsed
+        return response
+
+    return wrapped
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA = "replica"
+
+
+# Runs the PRAGMAS of a sqlite database's settings (see settings.SQLITE_PRAGMAS)
+# on every new connection, since most of them only last for the connection.
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = connection.settings_dict.get("PRAGMAS", {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def pragma(alias, name):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+# Adds a database alias at runtime, e.g. for benchmarking a copy of the
+# database under another configuration.
+def register_database(alias, settings_dict):
+    configured = connections.configure_settings(
+        {"default": connections.settings["default"], alias: settings_dict}
+    )
+    connections.settings[alias] = configured[alias]
+    return connections[alias]
+
+
+# Sends reads to the read-only REPLICA connection when there is one, except
+# inside a transaction on the default database, which must see its own writes.
+# Everything else goes to the default database.
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA not in settings.DATABASES:
+            return None
+        if connections["default"].in_atomic_block:
+            return "default"
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {"default", REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -0,0 +1,102 @@
+import django_filters
+from django.db.models import Count
+from rest_framework import filters
+
+from . import search
+from .models import Move, Pokemon, PokemonType
+
+
+class PokemonSearchFilter(filters.SearchFilter):
+    # Serves `?search=` from the full-text index where the database has one,
+    # and falls back to the `search_fields` LIKE lookups elsewhere.
+    def filter_queryset(self, request, queryset, view):
+        if not search.is_available():
+            return super().filter_queryset(request, queryset, view)
+        return search.search(queryset, self.get_search_terms(request))
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    # Breaks ties on the primary key, so pages of equal values don't overlap.
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        pk = queryset.model._meta.pk.name
+        if ordering and pk not in [field.lstrip("-") for field in ordering]:
+            ordering = [*ordering, pk]
+        return ordering
+
+
+# Ids of the pokemon linked through `through` to all (or any) of `values` of
+# the linked model's `lookup`. One grouped query on the link table, used as a
+# subquery so the pokemon rows are never joined and multiplied.
+def linked_pokemon(through, lookup, values, match_all):
+    values = set(values)
+    links = through.objects.filter(**{f"{lookup}__in": values}).values("pokemon_id")
+    if match_all and len(values) > 1:
+        links = (
+            links.annotate(matched=Count("pk"))
+            .filter(matched=len(values))
+            .values("pokemon_id")
+        )
+    return links
+
+
+class LinkedPokemonFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    def __init__(self, through, lookup, match_all, **kwargs):
+        super().__init__(**kwargs)
+        self.through = through
+        self.lookup = lookup
+        self.match_all = match_all
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.filter(
+            pk__in=linked_pokemon(self.through, self.lookup, value, self.match_all)
+        )
+
+
+class PokemonFilterSet(django_filters.FilterSet):
+    # Comma separated names: `types` and `moves` match pokemon with all of
+    # them, the `_any` variants with at least one. `types__type` and
+    # `moves__name` are the original single value filters.
+    types = LinkedPokemonFilter(
+        PokemonType.pokemons.through, "pokemontype__type", match_all=True
+    )
+    types_any = LinkedPokemonFilter(
+        PokemonType.pokemons.through, "pokemontype__type", match_all=False
+    )
+    types__type = LinkedPokemonFilter(
+        PokemonType.pokemons.through, "pokemontype__type", match_all=False
+    )
+    moves = LinkedPokemonFilter(Move.pokemons.through, "move__name", match_all=True)
+    moves_any = LinkedPokemonFilter(
+        Move.pokemons.through, "move__name", match_all=False
+    )
+    moves__name = LinkedPokemonFilter(
+        Move.pokemons.through, "move__name", match_all=False
+    )
+    # pokemon knowing a move with power in the range, as move_power_min and
+    # move_power_max
+    move_power = django_filters.RangeFilter(method="filter_move_power")
+
+    class Meta:
+        model = Pokemon
+        fields = []
+
+    def filter_move_power(self, queryset, name, value):
+        power = {}
+        if value.start is not None:
+            power["move__power__gte"] = value.start
+        if value.stop is not None:
+            power["move__power__lte"] = value.stop
+        links = Move.pokemons.through.objects.filter(**power).values("pokemon_id")
+        return queryset.filter(pk__in=links)
+
+
+class MoveFilterSet(django_filters.FilterSet):
+    # power_min and power_max, both inclusive
+    power = django_filters.RangeFilter()
+
+    class Meta:
+        model = Move
+        fields = []
@@ -0,0 +1,64 @@
+import json
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from pokemons.benchmark import HOST, run_asgi, run_wsgi
+from pokemons.models import Pokemon
+
+DUMMY_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF views served over WSGI with their async "
+        "counterparts served over ASGI, in process and against the current "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+        parser.add_argument("--output", type=str, help="write results as JSON")
+
+    def handle(self, *args, **options):
+        pk = Pokemon.objects.order_by("move_count").values_list("pk", flat=True).last()
+        if pk is None:
+            raise CommandError("No pokemon to benchmark, load some data first.")
+
+        endpoints = {
+            "list": "pokemons/",
+            "detail": f"pokemons/{pk}/",
+            "best_move": f"pokemons/{pk}/best_move/",
+            "similar": f"pokemons/{pk}/similar_pokemon/",
+        }
+
+        results = []
+        # responses must be rendered every time, and query logging off
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=[HOST], CACHES=DUMMY_CACHES):
+            wsgi, asgi = get_wsgi_application(), get_asgi_application()
+            for name, path in endpoints.items():
+                for concurrency in options["concurrency"]:
+                    for server, runner, application, prefix in [
+                        ("wsgi", run_wsgi, wsgi, "/"),
+                        ("asgi", run_asgi, asgi, "/async/"),
+                    ]:
+                        urls = [prefix + path] * options["requests"]
+                        result = {
+                            "endpoint": name,
+                            "server": server,
+                            "concurrency": concurrency,
+                            **runner(application, urls, concurrency),
+                        }
+                        results.append(result)
+                        self.stdout.write(
+                            "{endpoint:<10} {server} c={concurrency:<4} "
+                            "{rps:>9} req/s  p50 {p50_ms:>8} ms  "
+                            "p99 {p99_ms:>8} ms  errors {errors}".format(**result)
+                        )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
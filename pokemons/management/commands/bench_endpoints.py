@@ -0,0 +1,181 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from base64 import b64encode
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from pokemons.benchmark import summarize
+from pokemons.management.commands.bench_asgi import DUMMY_CACHES
+from pokemons.models import Pokemon, PokemonType, Move
+
+
+def keyset_cursor(after_pk):
+    return b64encode(urlencode({"p": after_pk}).encode()).decode()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, throughput and query counts of every endpoint against "
+        "the current database (see generate_catalog), and optionally compare "
+        "them with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=50, help="requests per endpoint"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="keep the response cache enabled",
+        )
+        parser.add_argument("--output", type=str, help="write results as JSON")
+        parser.add_argument(
+            "--compare", type=str, help="JSON results of an earlier run"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="allowed relative p95 slowdown before --compare fails",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.pokemon_ids = list(Pokemon.objects.values_list("pk", flat=True))
+        if not self.pokemon_ids:
+            raise CommandError("No pokemon to benchmark, run generate_catalog first.")
+        self.type_names = list(PokemonType.objects.values_list("type", flat=True))
+        self.move_names = list(Move.objects.values_list("name", flat=True))
+
+        overrides = {"DEBUG": False, "ALLOWED_HOSTS": ["testserver"]}
+        if not options["cached"]:
+            overrides["CACHES"] = DUMMY_CACHES
+
+        results = {
+            "meta": {
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "cached": options["cached"],
+                "pokemon": len(self.pokemon_ids),
+                "moves": len(self.move_names),
+                "types": len(self.type_names),
+                "move_links": Move.pokemons.through.objects.count(),
+            },
+            "endpoints": {},
+        }
+        with override_settings(**overrides):
+            client = Client()
+            for name, make_url in self.endpoints().items():
+                result = self.run(client, make_url, options["requests"])
+                results["endpoints"][name] = result
+                self.stdout.write(
+                    "{name:<24} {rps:>8} req/s  p50 {p50_ms:>8} ms  "
+                    "p95 {p95_ms:>8} ms  p99 {p99_ms:>8} ms  "
+                    "queries {queries_max:>3}  errors {errors}".format(
+                        name=name, **result
+                    )
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline, results, options["tolerance"])
+            if regressions:
+                raise CommandError(
+                    "Regressions against %s:\n%s"
+                    % (options["compare"], "\n".join(regressions))
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def pokemon_id(self):
+        return self.rng.choice(self.pokemon_ids)
+
+    def endpoints(self):
+        middle = sorted(self.pokemon_ids)[len(self.pokemon_ids) // 2]
+        last_page = max(
+            1, (len(self.pokemon_ids) - 1) // settings.REST_FRAMEWORK["PAGE_SIZE"] + 1
+        )
+        return {
+            "pokemon-list": lambda: "/pokemons/",
+            "pokemon-list-type": lambda: "/pokemons/?"
+            + urlencode({"types__type": self.rng.choice(self.type_names)}),
+            "pokemon-list-move": lambda: "/pokemons/?"
+            + urlencode({"moves__name": self.rng.choice(self.move_names)}),
+            "pokemon-list-search": lambda: "/pokemons/?"
+            + urlencode({"search": self.rng.choice(self.move_names)}),
+            "pokemon-list-deep-page": lambda: f"/pokemons/?page={last_page}",
+            "pokemon-list-deep-cursor": lambda: "/pokemons/?"
+            + urlencode({"cursor": keyset_cursor(middle)}),
+            "pokemon-detail": lambda: f"/pokemons/{self.pokemon_id()}/",
+            "pokemon-best-move": lambda: f"/pokemons/{self.pokemon_id()}/best_move/",
+            "pokemon-best-moves": lambda: "/pokemons/best_moves/?ids="
+            + ",".join(str(self.pokemon_id()) for _ in range(100)),
+            "pokemon-similar": lambda: f"/pokemons/{self.pokemon_id()}/similar_pokemon/",
+            "pokemon-similar-jaccard": lambda: f"/pokemons/{self.pokemon_id()}"
+            "/similar_pokemon/?metric=jaccard",
+            "move-list": lambda: "/moves/",
+            "type-list": lambda: "/types/",
+            "type-stats": lambda: "/types/stats/",
+            "move-stats": lambda: "/moves/stats/?ordering=-pokemon_count",
+        }
+
+    def run(self, client, make_url, requests):
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            url = make_url()
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = client.get(url, HTTP_ACCEPT="application/json")
+                latencies.append(time.perf_counter() - request_started)
+            queries.append(len(captured))
+            errors += response.status_code != 200
+        result = summarize(latencies, time.perf_counter() - started, errors)
+        result["queries_min"] = min(queries)
+        result["queries_max"] = max(queries)
+        return result
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for name, result in results["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if before is None:
+                continue
+            if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms"
+                )
+            if result["queries_max"] > before["queries_max"]:
+                regressions.append(
+                    f"{name}: queries {before['queries_max']} -> "
+                    f"{result['queries_max']}"
+                )
+        return regressions
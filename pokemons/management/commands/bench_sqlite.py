@@ -0,0 +1,173 @@
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from pokemons.benchmark import summarize
+from pokemons.db import register_database
+from pokemons.models import Move, Pokemon
+
+PAGE_SIZE = 10
+LINKS_PER_POKEMON = 5
+
+
+def profiles(directory):
+    # The stock configuration next to the production one from settings.py:
+    # rollback journal, a connection per request and reads on the default
+    # connection, versus WAL, persistent connections and a read-only replica.
+    engine = "django.db.backends.sqlite3"
+    plain = directory / "plain.sqlite3"
+    tuned = directory / "tuned.sqlite3"
+    tuned_options = {
+        "ENGINE": engine,
+        "CONN_MAX_AGE": None,
+        "OPTIONS": {"timeout": 20},
+        "PRAGMAS": settings.SQLITE_PRAGMAS,
+    }
+    return {
+        "default": (plain, {"ENGINE": engine, "NAME": plain}, None),
+        "production": (
+            tuned,
+            {"NAME": tuned, **tuned_options},
+            {
+                "NAME": f"file:{tuned}?mode=ro",
+                **tuned_options,
+                "PRAGMAS": {
+                    name: value
+                    for name, value in settings.SQLITE_PRAGMAS.items()
+                    if name != "journal_mode"
+                },
+            },
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against copies of the database, "
+        "once with the default sqlite configuration and once with the "
+        "production profile, and compare their throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--output", type=str, help="write results as JSON")
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("This benchmark compares sqlite configurations.")
+        self.pokemon_count = Pokemon.objects.using("default").count()
+        self.move_ids = list(Move.objects.using("default").values_list("pk", flat=True))
+        if not self.pokemon_count or len(self.move_ids) < LINKS_PER_POKEMON:
+            raise CommandError("Not enough data to benchmark, run generate_catalog.")
+
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for profile, (path, writer, reader) in profiles(Path(directory)).items():
+                pragmas = writer.get("PRAGMAS", {})
+                self.copy_database(path, pragmas.get("journal_mode", "delete"))
+                write_alias = f"bench_{profile}"
+                register_database(write_alias, writer)
+                read_alias = write_alias
+                if reader is not None:
+                    read_alias = f"{write_alias}_replica"
+                    register_database(read_alias, reader)
+
+                for role, result in self.run(read_alias, write_alias, options).items():
+                    result = {"profile": profile, "role": role, **result}
+                    results.append(result)
+                    self.stdout.write(
+                        "{profile:<10} {role:<6} {rps:>9} ops/s  "
+                        "p50 {p50_ms:>9} ms  p95 {p95_ms:>9} ms  "
+                        "p99 {p99_ms:>9} ms  errors {errors}".format(**result)
+                    )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def copy_database(self, path, journal_mode):
+        source = connections["default"]
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target)
+            target.execute(f"PRAGMA journal_mode = {journal_mode}")
+        finally:
+            target.close()
+
+    def run(self, read_alias, write_alias, options):
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+
+        def worker(role, operation, seed):
+            rng = random.Random(seed)
+            samples, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(rng)
+                    except OperationalError:
+                        failed += 1
+                    else:
+                        samples.append(time.perf_counter() - started)
+                    # what Django does at the end of every request
+                    for alias in {read_alias, write_alias}:
+                        connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections.close_all()
+            with lock:
+                latencies[role].extend(samples)
+                errors[role] += failed
+
+        def read(rng):
+            offset = rng.randrange(max(1, self.pokemon_count - PAGE_SIZE))
+            list(
+                Pokemon.objects.using(read_alias)
+                .prefetch_related("types", "moves")
+                .order_by("id")[offset : offset + PAGE_SIZE]
+            )
+
+        def write(rng):
+            with transaction.atomic(using=write_alias):
+                (pokemon,) = Pokemon.objects.using(write_alias).bulk_create(
+                    [Pokemon(name=f"bench-{rng.random()}", order=0, height=1, weight=1)]
+                )
+                Pokemon.moves.through.objects.using(write_alias).bulk_create(
+                    Pokemon.moves.through(pokemon_id=pokemon.pk, move_id=move_id)
+                    for move_id in rng.sample(self.move_ids, LINKS_PER_POKEMON)
+                )
+                Pokemon.objects.using(write_alias).filter(
+                    pk=pokemon.pk
+                ).refresh_move_summary()
+
+        threads = [
+            threading.Thread(target=worker, args=("read", read, seed))
+            for seed in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", write, -seed - 1))
+            for seed in range(options["writers"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            role: summarize(latencies[role], elapsed, errors[role])
+            for role in ("read", "write")
+        }
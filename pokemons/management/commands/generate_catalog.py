@@ -0,0 +1,172 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from pokemons import search, stats
+from pokemons.cache import bump_version
+from pokemons.models import (
+    Move,
+    MoveStats,
+    Pokemon,
+    PokemonMoveCounts,
+    PokemonType,
+    TypeMoveStats,
+    TypeStats,
+)
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a synthetic catalog for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pokemon", type=int, default=10000)
+        parser.add_argument("--moves", type=int, default=1000)
+        parser.add_argument("--types", type=int, default=18)
+        parser.add_argument(
+            "--links",
+            type=int,
+            default=500000,
+            help="total number of pokemon-move links",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--clear", action="store_true", help="delete existing data first"
+        )
+
+    def handle(self, *args, **options):
+        if options["pokemon"] < 1 or options["moves"] < 1 or options["types"] < 1:
+            raise CommandError("--pokemon, --moves and --types must be positive")
+        if options["links"] > options["pokemon"] * options["moves"]:
+            raise CommandError("--links exceeds --pokemon times --moves")
+        if not options["clear"] and Pokemon.objects.exists():
+            raise CommandError("The database is not empty, pass --clear")
+
+        self.verbosity = options["verbosity"]
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if options["clear"]:
+                self.clear()
+            type_ids = self.create_types(options["types"])
+            move_ids = self.create_moves(options["moves"])
+            pokemon_ids = self.create_pokemon(options["pokemon"])
+            self.link_types(pokemon_ids, type_ids)
+            self.link_moves(pokemon_ids, move_ids, options["links"])
+
+            # the inserts above bypass the signal handlers
+            self.log("Refreshing denormalized move data")
+            Pokemon.objects.refresh_move_summary()
+            self.log("Rebuilding the search index")
+            search.reindex_all()
+            self.log("Rebuilding the type and move stats")
+            stats.rebuild()
+            bump_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(pokemon_ids)} pokemon, {len(move_ids)} moves, "
+                f"{len(type_ids)} types and {options['links']} move links "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        )
+
+    def log(self, message):
+        if self.verbosity > 0:
+            self.stderr.write(message)
+
+    def clear(self):
+        self.log("Deleting existing data")
+        # plain DELETEs, the ORM would load every row to run delete signals
+        with connection.cursor() as cursor:
+            for model in [
+                TypeStats,
+                MoveStats,
+                TypeMoveStats,
+                PokemonMoveCounts,
+                PokemonType.pokemons.through,
+                Move.pokemons.through,
+                Pokemon,
+                Move,
+                PokemonType,
+            ]:
+                cursor.execute(f"DELETE FROM {model._meta.db_table}")
+
+    def create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return list(model.objects.order_by("pk").values_list("pk", flat=True))
+
+    def create_types(self, count):
+        self.log(f"Creating {count} types")
+        return self.create(
+            PokemonType, [PokemonType(type=f"type-{i}") for i in range(count)]
+        )
+
+    def create_moves(self, count):
+        self.log(f"Creating {count} moves")
+        return self.create(
+            Move,
+            [
+                Move(name=f"move-{i}", power=self.rng.randint(0, 250))
+                for i in range(count)
+            ],
+        )
+
+    def create_pokemon(self, count):
+        self.log(f"Creating {count} pokemon")
+        return self.create(
+            Pokemon,
+            [
+                Pokemon(
+                    name=f"pokemon-{i}",
+                    order=i,
+                    height=self.rng.randint(1, 200),
+                    weight=self.rng.randint(1, 10000),
+                )
+                for i in range(count)
+            ],
+        )
+
+    def link(self, through, source, pairs):
+        batch = []
+        for pokemon_id, source_id in pairs:
+            batch.append(through(pokemon_id=pokemon_id, **{source: source_id}))
+            if len(batch) >= self.batch_size:
+                through.objects.bulk_create(batch)
+                batch = []
+        through.objects.bulk_create(batch)
+
+    def link_types(self, pokemon_ids, type_ids):
+        self.log("Linking types")
+        self.link(
+            PokemonType.pokemons.through,
+            "pokemontype_id",
+            (
+                (pokemon_id, type_id)
+                for pokemon_id in pokemon_ids
+                for type_id in self.rng.sample(
+                    type_ids, min(len(type_ids), self.rng.randint(1, 2))
+                )
+            ),
+        )
+
+    def link_moves(self, pokemon_ids, move_ids, links):
+        self.log(f"Linking {links} moves")
+        per_pokemon, remainder = divmod(links, len(pokemon_ids))
+        self.link(
+            Move.pokemons.through,
+            "move_id",
+            (
+                (pokemon_id, move_id)
+                for i, pokemon_id in enumerate(pokemon_ids)
+                for move_id in self.rng.sample(
+                    move_ids, per_pokemon + (1 if i < remainder else 0)
+                )
+            ),
+        )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pokemons import stats
+from pokemons.cache import bump_version
+from pokemons.models import MoveStats, TypeStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the type and move stats tables from scratch, e.g. after "
+        "writes that bypassed the signal handlers."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            stats.rebuild()
+            bump_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the stats of {TypeStats.objects.count()} types and "
+                f"{MoveStats.objects.count()} moves "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,125 @@
+import asyncio
+
+import requests
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+import poke_api
+from pokemons.bulk import BATCH_SIZE, SyncResult, sync_pokemon
+
+
+class Command(BaseCommand):
+    help = (
+        "Crawl PokeAPI by type or move, or the whole catalog with --all, and "
+        "upsert the results in batches."
+    )
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--type", type=str)
+        group.add_argument("--move", type=str)
+        group.add_argument("--all", action="store_true")
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help="file recording the progress of --all, to resume an interrupted crawl",
+        )
+        parser.add_argument("--page-size", type=int, default=poke_api.PAGE_SIZE)
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=0,
+            help="maximum number of pokemon to crawl, 0 for all",
+        )
+        parser.add_argument(
+            "--offset",
+            type=int,
+            default=0,
+            help="number of pokemon of the type or move to skip",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--concurrency", type=int, default=poke_api.CONCURRENCY)
+        parser.add_argument("--cache-dir", type=str)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=poke_api.RATE,
+            help="maximum requests per second, 0 for no limit",
+        )
+        parser.add_argument("--retries", type=int, default=poke_api.RETRIES)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            help="seconds to connect and to wait for each read of a response",
+        )
+
+    def handle(self, *args, **options):
+        if options["checkpoint"] and not options["all"]:
+            raise CommandError("--checkpoint requires --all")
+        if options["timeout"] is not None and options["timeout"] <= 0:
+            raise CommandError("--timeout must be positive")
+
+        disk_cache = None
+        if options["cache_dir"]:
+            disk_cache = poke_api.DiskCache(options["cache_dir"])
+        client = poke_api.HttpClient(
+            options["concurrency"],
+            rate=options["rate"],
+            retries=options["retries"],
+            timeout=options["timeout"] or poke_api.TIMEOUT,
+        )
+        fetcher = poke_api.Fetcher(
+            options["concurrency"], disk_cache=disk_cache, client=client
+        )
+
+        if options["all"]:
+            checkpoint = None
+            if options["checkpoint"]:
+                checkpoint = poke_api.Checkpoint(options["checkpoint"])
+            crawl = self.sync_all(
+                fetcher, checkpoint, options["page_size"], options["batch_size"]
+            )
+        else:
+            crawl = self.sync_endpoint(fetcher, options)
+        try:
+            result = asyncio.run(crawl)
+        except requests.RequestException as exc:
+            raise CommandError(f"Crawl failed: {exc}")
+        finally:
+            fetcher.close()
+
+        self.stdout.write(self.style.SUCCESS(str(result)))
+        self.stderr.write(fetcher.stats())
+
+    def sync_endpoint(self, fetcher, options):
+        if options["type"]:
+            pokemon_stream = poke_api.iter_pokemon_by_type(
+                options["type"], fetcher, options["limit"], options["offset"]
+            )
+        else:
+            pokemon_stream = poke_api.iter_pokemon_by_move(
+                options["move"], fetcher, options["limit"], options["offset"]
+            )
+        return self.sync(pokemon_stream, options["batch_size"])
+
+    async def sync(self, pokemon_stream, batch_size):
+        result = SyncResult()
+        sync = sync_to_async(sync_pokemon)
+        batch = []
+        async for pokemon in pokemon_stream:
+            batch.append(pokemon)
+            if len(batch) >= batch_size:
+                result.merge(await sync(batch, batch_size))
+                batch = []
+        if batch:
+            result.merge(await sync(batch, batch_size))
+        return result
+
+    # Each page is upserted before the next one is requested, so the
+    # checkpoint only ever records pages that are in the database.
+    async def sync_all(self, fetcher, checkpoint, page_size, batch_size):
+        result = SyncResult()
+        sync = sync_to_async(sync_pokemon)
+        async for pokemon_list in poke_api.crawl_pages(fetcher, checkpoint, page_size):
+            result.merge(await sync(pokemon_list, batch_size))
+        return result
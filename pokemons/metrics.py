@@ -0,0 +1,284 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from . import cache
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, values, amount):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, amount)] += 1
+        series[-1] += amount
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, series in sorted(self.series.items()):
+            labels = format_labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                bucket = format_labels(self.labels + ("le",), values + (bound,))
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            yield f"{self.name}_sum{labels} {format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values, amount=1):
+        self.series[values] = self.series.get(values, 0) + amount
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, value in sorted(self.series.items()):
+            yield f"{self.name}{format_labels(self.labels, values)} {format_value(value)}"
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (
+        format_value(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+        for value in values
+    )
+    return "{%s}" % ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+# Metrics live in process memory, so every worker process exposes its own and
+# Prometheus sums them per instance.
+lock = threading.Lock()
+requests_total = Counter(
+    "pokemons_http_requests_total",
+    "Requests served, by route, method and status.",
+    ("route", "method", "status"),
+)
+request_duration = Histogram(
+    "pokemons_http_request_duration_seconds",
+    "Time spent serving a request, middleware included.",
+    ("route", "method"),
+    LATENCY_BUCKETS,
+)
+render_duration = Histogram(
+    "pokemons_http_render_duration_seconds",
+    "Time spent rendering serialized data into the response body.",
+    ("route", "method"),
+    LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "pokemons_http_response_size_bytes",
+    "Size of the response body.",
+    ("route", "method"),
+    SIZE_BUCKETS,
+)
+db_queries = Histogram(
+    "pokemons_db_queries",
+    "SQL queries run per request.",
+    ("route", "method"),
+    QUERY_BUCKETS,
+)
+db_duration = Histogram(
+    "pokemons_db_query_duration_seconds",
+    "Time spent in SQL queries per request.",
+    ("route", "method"),
+    LATENCY_BUCKETS,
+)
+registry = [
+    requests_total,
+    request_duration,
+    render_duration,
+    response_size,
+    db_queries,
+    db_duration,
+]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.render_seconds = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+# The metrics of the request being served. sync_to_async runs its function in
+# a copy of the caller's context, so queries the async ORM runs on its worker
+# thread count towards the request that awaits them.
+current = ContextVar("pokemons_request_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    request_metrics = current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+# Hooks every connection, on whichever thread it is opened, so that no thread
+# needs to be visited per request to install the wrapper.
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Renders a template response (e.g. a DRF Response) and records the time taken
+# on the request; rendering again later is a no-op.
+def render(request, response):
+    started = time.perf_counter()
+    response.render()
+    request_metrics = getattr(request, "_metrics", None)
+    if request_metrics is not None:
+        request_metrics.render_seconds = (request_metrics.render_seconds or 0.0) + (
+            time.perf_counter() - started
+        )
+    return response
+
+
+def route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unmatched"
+
+
+# Runs natively on either handler: under ASGI it stays on the event loop, so
+# async views are not pushed to a thread pool on its account.
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics, token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.observe(request, response, request_metrics, started)
+
+    async def __acall__(self, request):
+        request_metrics, token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.observe(request, response, request_metrics, started)
+
+    def start(self, request):
+        request_metrics = request._metrics = RequestMetrics()
+        return request_metrics, current.set(request_metrics)
+
+    def observe(self, request, response, request_metrics, started):
+        elapsed = time.perf_counter() - started
+        name = route(request)
+        if name == "metrics":
+            return response
+        labels = (name, request.method)
+        with lock:
+            requests_total.inc(labels + (str(response.status_code),))
+            request_duration.observe(labels, elapsed)
+            db_queries.observe(labels, request_metrics.queries)
+            db_duration.observe(labels, request_metrics.query_seconds)
+            if request_metrics.render_seconds is not None:
+                render_duration.observe(labels, request_metrics.render_seconds)
+            if not response.streaming:
+                response_size.observe(labels, len(response.content))
+        return response
+
+    def process_template_response(self, request, response):
+        return render(request, response)
+
+
+def cache_metrics():
+    hits = Counter(
+        "pokemons_response_cache_hits_total",
+        "Responses served from the response cache.",
+        ("route",),
+    )
+    misses = Counter(
+        "pokemons_response_cache_misses_total",
+        "Responses rendered and stored in the response cache.",
+        ("route",),
+    )
+    hit_seconds = Counter(
+        "pokemons_response_cache_hit_seconds_total",
+        "Time spent serving responses from the response cache.",
+        ("route",),
+    )
+    miss_seconds = Counter(
+        "pokemons_response_cache_miss_seconds_total",
+        "Time spent rendering and storing responses in the response cache.",
+        ("route",),
+    )
+    for name, endpoint in cache.stats.items():
+        hits.inc((name,), endpoint["hits"])
+        misses.inc((name,), endpoint["misses"])
+        hit_seconds.inc((name,), endpoint["hit_seconds"])
+        miss_seconds.inc((name,), endpoint["miss_seconds"])
+    return [hits, misses, hit_seconds, miss_seconds]
+
+
+def expose():
+    with lock:
+        lines = [
+            line for metric in registry + cache_metrics() for line in metric.expose()
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(expose(), content_type=CONTENT_TYPE)
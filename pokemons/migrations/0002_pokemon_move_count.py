@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_move_counts(apps, schema_editor):
+    Pokemon = apps.get_model("pokemons", "Pokemon")
+    Move = apps.get_model("pokemons", "Move")
+    counts = (
+        Move.pokemons.through.objects.filter(pokemon_id=OuterRef("pk"))
+        .order_by()
+        .values("pokemon_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Pokemon.objects.update(move_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pokemons", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pokemon",
+            name="move_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_move_counts, migrations.RunPython.noop),
+    ]
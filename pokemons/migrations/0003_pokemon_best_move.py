@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:13
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_best_moves(apps, schema_editor):
+    Pokemon = apps.get_model("pokemons", "Pokemon")
+    Move = apps.get_model("pokemons", "Move")
+    best_moves = (
+        Move.pokemons.through.objects.filter(pokemon_id=OuterRef("pk"))
+        .order_by("-move__power", "move_id")
+        .values("move_id")[:1]
+    )
+    Pokemon.objects.update(best_move=Subquery(best_moves))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pokemons", "0002_pokemon_move_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pokemon",
+            name="best_move",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="pokemons.move",
+            ),
+        ),
+        migrations.RunPython(backfill_best_moves, migrations.RunPython.noop),
+    ]
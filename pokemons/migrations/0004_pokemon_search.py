@@ -0,0 +1,46 @@
+from django.db import migrations
+
+TABLE = "pokemons_pokemon_search"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {TABLE} USING fts5(name, types, moves)"
+    )
+    schema_editor.execute(f"""
+        INSERT INTO {TABLE} (rowid, name, types, moves)
+        SELECT
+            p.id,
+            p.name,
+            COALESCE((
+                SELECT group_concat(t.type, ' ')
+                FROM pokemons_pokemontype_pokemons tp
+                JOIN pokemons_pokemontype t ON t.id = tp.pokemontype_id
+                WHERE tp.pokemon_id = p.id
+            ), ''),
+            COALESCE((
+                SELECT group_concat(m.name, ' ')
+                FROM pokemons_move_pokemons mp
+                JOIN pokemons_move m ON m.id = mp.move_id
+                WHERE mp.pokemon_id = p.id
+            ), '')
+        FROM pokemons_pokemon p
+        """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TABLE {TABLE}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pokemons", "0003_pokemon_best_move"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:37
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max
+import django.db.models.deletion
+
+
+def backfill_stats(apps, schema_editor):
+    PokemonType = apps.get_model("pokemons", "PokemonType")
+    Move = apps.get_model("pokemons", "Move")
+    TypeStats = apps.get_model("pokemons", "TypeStats")
+    MoveStats = apps.get_model("pokemons", "MoveStats")
+    type_links = PokemonType.pokemons.through.objects
+    move_links = Move.pokemons.through.objects
+
+    for type_id in PokemonType.objects.values_list("pk", flat=True):
+        pokemon_ids = type_links.filter(pokemontype_id=type_id).values("pokemon_id")
+        moves = Move.objects.filter(
+            pk__in=move_links.filter(pokemon_id__in=pokemon_ids).values("move_id")
+        )
+        TypeStats.objects.create(
+            type_id=type_id,
+            pokemon_count=pokemon_ids.count(),
+            **moves.aggregate(
+                move_count=Count("pk"),
+                average_power=Avg("power"),
+                max_power=Max("power"),
+            ),
+        )
+
+    counts = dict(
+        move_links.values("move_id")
+        .annotate(count=Count("pk"))
+        .values_list("move_id", "count")
+    )
+    MoveStats.objects.bulk_create(
+        [
+            MoveStats(move_id=pk, pokemon_count=counts.get(pk, 0))
+            for pk in Move.objects.values_list("pk", flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pokemons", "0004_pokemon_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MoveStats",
+            fields=[
+                (
+                    "move",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="pokemons.move",
+                    ),
+                ),
+                ("pokemon_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TypeStats",
+            fields=[
+                (
+                    "type",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="pokemons.pokemontype",
+                    ),
+                ),
+                ("pokemon_count", models.PositiveIntegerField(default=0)),
+                ("move_count", models.PositiveIntegerField(default=0)),
+                ("average_power", models.FloatField(null=True)),
+                ("max_power", models.PositiveIntegerField(null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:11
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_type_move_stats(apps, schema_editor):
+    Move = apps.get_model("pokemons", "Move")
+    TypeMoveStats = apps.get_model("pokemons", "TypeMoveStats")
+    rows = (
+        Move.pokemons.through.objects.filter(pokemon__types__isnull=False)
+        .values("pokemon__types", "move_id")
+        .annotate(count=Count("pk"))
+        .values_list("pokemon__types", "move_id", "count")
+    )
+    TypeMoveStats.objects.bulk_create(
+        [
+            TypeMoveStats(type_id=type_id, move_id=move_id, pokemon_count=count)
+            for type_id, move_id, count in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pokemons", "0005_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TypeMoveStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pokemon_count", models.PositiveIntegerField()),
+                (
+                    "move",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="pokemons.move",
+                    ),
+                ),
+                (
+                    "type",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="pokemons.pokemontype",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="typemovestats",
+            constraint=models.UniqueConstraint(
+                fields=("type", "move"), name="unique_type_move_stats"
+            ),
+        ),
+        migrations.RunPython(backfill_type_move_stats, migrations.RunPython.noop),
+    ]
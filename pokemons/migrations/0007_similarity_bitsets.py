@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:21
+
+import sys
+from array import array
+
+from django.db import migrations, models
+
+MOVE_COUNT_BLOCK = 4096
+
+
+# pokemons.similarity.bitset as of this migration
+def bitset(pokemon_ids):
+    bits = bytearray()
+    for pokemon_id in pokemon_ids:
+        index = pokemon_id >> 3
+        if index >= len(bits):
+            bits.extend(bytes(index + 1 - len(bits)))
+        bits[index] |= 1 << (pokemon_id & 7)
+    return bytes(bits)
+
+
+def backfill(apps, schema_editor):
+    Pokemon = apps.get_model("pokemons", "Pokemon")
+    Move = apps.get_model("pokemons", "Move")
+    MoveStats = apps.get_model("pokemons", "MoveStats")
+    PokemonMoveCounts = apps.get_model("pokemons", "PokemonMoveCounts")
+
+    for stats in MoveStats.objects.all():
+        stats.pokemon_bits = bitset(
+            Move.pokemons.through.objects.filter(move_id=stats.move_id).values_list(
+                "pokemon_id", flat=True
+            )
+        )
+        stats.save(update_fields=["pokemon_bits"])
+
+    blocks = {}
+    for pokemon_id, move_count in Pokemon.objects.values_list("pk", "move_count"):
+        block, index = divmod(pokemon_id, MOVE_COUNT_BLOCK)
+        counts = blocks.setdefault(block, array("H"))
+        if index >= len(counts):
+            counts.extend(bytes(index + 1 - len(counts)))
+        counts[index] = move_count
+    for block, counts in blocks.items():
+        if sys.byteorder == "big":
+            counts.byteswap()
+        PokemonMoveCounts.objects.create(block=block, counts=counts.tobytes())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pokemons", "0006_type_move_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PokemonMoveCounts",
+            fields=[
+                (
+                    "block",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("counts", models.BinaryField(default=b"")),
+            ],
+        ),
+        migrations.AddField(
+            model_name="movestats",
+            name="pokemon_bits",
+            field=models.BinaryField(default=b""),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+TABLE = "pokemons_pokemon_search"
+
+
+# Rebuilds the search documents with pokemons.search.SEPARATOR between type and
+# move names, `separator` being what they were joined with before.
+def rebuild_search_index(separator):
+    def rebuild(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        schema_editor.execute(f"DELETE FROM {TABLE}")
+        schema_editor.execute(
+            f"""
+            INSERT INTO {TABLE} (rowid, name, types, moves)
+            SELECT
+                p.id,
+                p.name,
+                COALESCE((
+                    SELECT group_concat(t.type, %s)
+                    FROM pokemons_pokemontype_pokemons tp
+                    JOIN pokemons_pokemontype t ON t.id = tp.pokemontype_id
+                    WHERE tp.pokemon_id = p.id
+                ), ''),
+                COALESCE((
+                    SELECT group_concat(m.name, %s)
+                    FROM pokemons_move_pokemons mp
+                    JOIN pokemons_move m ON m.id = mp.move_id
+                    WHERE mp.pokemon_id = p.id
+                ), '')
+            FROM pokemons_pokemon p
+            """,
+            [separator, separator],
+        )
+
+    return rebuild
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pokemons", "0007_similarity_bitsets"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            rebuild_search_index(" \ue000 "), rebuild_search_index(" ")
+        ),
+    ]
@@ -1,5 +1,30 @@
+import sys
+from array import array
+
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class PokemonQuerySet(models.QuerySet):
+    # Recomputes the denormalized `move_count` and `best_move` of the selected
+    # pokemon. Used by the signal handlers and by bulk writes that bypass them.
+    def refresh_move_summary(self):
+        links = Move.pokemons.through.objects.filter(pokemon_id=OuterRef("pk"))
+        counts = (
+            links.order_by()
+            .values("pokemon_id")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        best_moves = links.order_by("-move__power", "move_id").values("move_id")[:1]
+        updated = self.update(
+            move_count=Coalesce(Subquery(counts), 0),
+            best_move=Subquery(best_moves),
+        )
+        PokemonMoveCounts.store(self.values_list("pk", "move_count"))
+        return updated
 
 
 class Pokemon(models.Model):
@@ -7,6 +32,17 @@ class Pokemon(models.Model):
     order = models.IntegerField(validators=[MinValueValidator(0)])
     height = models.FloatField(validators=[MinValueValidator(0)])
     weight = models.FloatField(validators=[MinValueValidator(0)])
+    move_count = models.PositiveIntegerField(default=0, editable=False)
+    best_move = models.ForeignKey(
+        "Move",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    objects = PokemonQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -27,3 +63,113 @@ class Move(models.Model):
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets the post_save handlers skip pokemon refreshes for unchanged fields
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self, field_name):
+        loaded_values = getattr(self, "_loaded_values", {})
+        return loaded_values.get(field_name) != getattr(self, field_name)
+
+
+# Summary tables behind the stats endpoints, kept up to date by pokemons.stats
+# as links and move powers change, and rebuilt by the rebuild_stats command.
+class TypeStats(models.Model):
+    type = models.OneToOneField(
+        PokemonType, primary_key=True, on_delete=models.CASCADE, related_name="stats"
+    )
+    pokemon_count = models.PositiveIntegerField(default=0)
+    # over the distinct moves known by pokemon of the type
+    move_count = models.PositiveIntegerField(default=0)
+    average_power = models.FloatField(null=True)
+    max_power = models.PositiveIntegerField(null=True)
+
+
+class MoveStats(models.Model):
+    move = models.OneToOneField(
+        Move, primary_key=True, on_delete=models.CASCADE, related_name="stats"
+    )
+    pokemon_count = models.PositiveIntegerField(default=0)
+    # the ids of the pokemon that know the move, see similarity.bitset
+    pokemon_bits = models.BinaryField(default=b"")
+
+
+# Pokemon.move_count again, as little-endian arrays of the counts of
+# MOVE_COUNT_BLOCK pokemon by id, so that similarity.ranked_candidates reads
+# the counts of thousands of candidates from a few rows.
+MOVE_COUNT_BLOCK = 4096
+
+
+class PokemonMoveCounts(models.Model):
+    block = models.PositiveIntegerField(primary_key=True)
+    counts = models.BinaryField(default=b"")
+
+    @staticmethod
+    def decode(data):
+        counts = array("H", bytes(data))
+        if sys.byteorder == "big":
+            counts.byteswap()
+        return counts
+
+    @staticmethod
+    def encode(counts):
+        if sys.byteorder == "big":
+            counts = array("H", counts)
+            counts.byteswap()
+        return counts.tobytes()
+
+    # Writes (pokemon id, move count) pairs.
+    @classmethod
+    def store(cls, move_counts):
+        blocks = {}
+        for pokemon_id, move_count in move_counts:
+            block, index = divmod(pokemon_id, MOVE_COUNT_BLOCK)
+            blocks.setdefault(block, []).append((index, move_count))
+        if not blocks:
+            return
+        rows = cls.objects.in_bulk(list(blocks))
+        updated = []
+        for block, move_counts in blocks.items():
+            counts = cls.decode(rows[block].counts if block in rows else b"")
+            for index, move_count in move_counts:
+                if index >= len(counts):
+                    counts.extend(bytes(index + 1 - len(counts)))
+                counts[index] = move_count
+            updated.append(cls(block=block, counts=cls.encode(counts)))
+        cls.objects.bulk_create(
+            updated,
+            update_conflicts=True,
+            unique_fields=["block"],
+            update_fields=["counts"],
+        )
+
+    # The move counts of every pokemon, indexed by id; 0 past the last one.
+    @classmethod
+    def load(cls):
+        move_counts = array("H")
+        for block, data in cls.objects.order_by("block").values_list("block", "counts"):
+            move_counts.extend(bytes(block * MOVE_COUNT_BLOCK - len(move_counts)))
+            move_counts.extend(cls.decode(data))
+        return move_counts
+
+
+# The number of pokemon of `type` that know `move`, a row per pair with at
+# least one. Link changes apply their delta here, so TypeStats is derived from
+# a type's distinct moves instead of all the links of its pokemon.
+class TypeMoveStats(models.Model):
+    type = models.ForeignKey(
+        PokemonType, on_delete=models.CASCADE, db_index=False, related_name="+"
+    )
+    move = models.ForeignKey(Move, on_delete=models.CASCADE, related_name="+")
+    pokemon_count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["type", "move"], name="unique_type_move_stats"
+            )
+        ]
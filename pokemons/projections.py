@@ -0,0 +1,125 @@
+from django.db.models import FloatField
+from rest_framework.response import Response
+
+from .models import Move, PokemonType
+from .serializers import FieldsQuerySerializer
+
+# orjson writes floats in exponent notation differently from json, so it is
+# only used when every float falls in the range both print in full.
+EXACT_FLOATS = (1e-4, 1e16)
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def group(pairs):
+    grouped = {}
+    for pokemon_id, value in pairs:
+        grouped.setdefault(pokemon_id, []).append(value)
+    return grouped
+
+
+# Type ids per pokemon id, ordered like PokemonSerializer's `types`.
+def pokemon_types(ids):
+    return group(
+        PokemonType.pokemons.through.objects.filter(pokemon_id__in=ids)
+        .order_by("pokemontype_id")
+        .values_list("pokemon_id", "pokemontype_id")
+    )
+
+
+# Moves per pokemon id, shaped and ordered like PokemonSerializer's `moves`.
+def pokemon_moves(ids):
+    rows = (
+        Move.pokemons.through.objects.filter(pokemon_id__in=ids)
+        .order_by("move_id")
+        .values_list("pokemon_id", "move__name", "move__power")
+    )
+    return group(
+        (pokemon_id, {"name": name, "power": power}) for pokemon_id, name, power in rows
+    )
+
+
+def exact_floats(rows, fields):
+    low, high = EXACT_FLOATS
+    return all(
+        value == 0 or low <= abs(value) < high
+        for row in rows
+        for field in fields
+        if (value := row[field]) is not None
+    )
+
+
+def float_columns(model, values):
+    return [
+        field
+        for field in values
+        if isinstance(model._meta.get_field(field), FloatField)
+    ]
+
+
+def requested_fields(request, fields):
+    query = FieldsQuerySerializer(data=request.query_params, context={"fields": fields})
+    query.is_valid(raise_exception=True)
+    return query.validated_data.get("fields", fields)
+
+
+def columns(fields, projections):
+    return [field for field in fields if field not in projections]
+
+
+# Adds the related `projections` among `fields` to `rows` of values() that
+# include the id, and returns the rows restricted to `fields`.
+def project(rows, fields, projections):
+    ids = [row["id"] for row in rows]
+    for field in fields:
+        if field in projections:
+            related = projections[field](ids)
+            for row in rows:
+                row[field] = related.get(row["id"], [])
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+# Yields the projected rows of the whole `queryset` in lists of `chunk_size`,
+# walking the primary key so every chunk is one indexed query whatever its
+# position, and memory does not grow with the size of the table.
+def export_chunks(queryset, fields, projections, chunk_size=EXPORT_CHUNK_SIZE):
+    queryset = queryset.prefetch_related(None).order_by("pk")
+    queryset = queryset.values(*dict.fromkeys(["id", *columns(fields, projections)]))
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        last = rows[-1]["id"]
+        yield project(rows, fields, projections)
+        if len(rows) < chunk_size:
+            return
+
+
+class ProjectedListMixin:
+    # Lists rows built straight from values() and batched lookups of the
+    # related `projections` instead of serializer instances, in the shape of
+    # `serializer_class`. `?fields=` picks a subset of the fields, and the
+    # lookups of the fields left out are skipped.
+    projections = {}
+
+    def list(self, request, *args, **kwargs):
+        fields = requested_fields(request, self.get_serializer_class().Meta.fields)
+        values = columns(fields, self.projections)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        queryset = queryset.values(*dict.fromkeys(["id", *values]))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset if page is None else page)
+
+        self.exact_floats = exact_floats(rows, float_columns(queryset.model, values))
+        data = project(rows, fields, self.projections)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def get_renderer_context(self):
+        context = super().get_renderer_context()
+        context["exact_floats"] = getattr(self, "exact_floats", False)
+        return context
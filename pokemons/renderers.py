@@ -0,0 +1,85 @@
+import csv
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional, installed with the "fast" extra
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Renders compact JSON with orjson when it is installed and the view
+    # vouches for its floats (see pokemons.projections), byte for byte like
+    # JSONRenderer, which it falls back to otherwise.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or data is None
+            or not renderer_context.get("exact_floats")
+            or self.get_indent(accepted_media_type, renderer_context)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # like JSONRenderer, escape the separators JavaScript can't have in strings
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+# The export formats. Only errors go through render(), as JSON and labelled
+# as such rather than with the format asked for; rows are written by stream()
+# as they are read.
+class ExportRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            # Response sets its Content-Type before rendering
+            response["Content-Type"] = JSONRenderer.media_type
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def stream(self, chunks, fields):
+        for rows in chunks:
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def stream(self, chunks, fields):
+        # lists, such as the types and moves of a pokemon, are JSON cells
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields).encode()
+        for rows in chunks:
+            yield "".join(
+                writer.writerow(
+                    [
+                        dumps(value).decode() if isinstance(value, list) else value
+                        for value in row.values()
+                    ]
+                )
+                for row in rows
+            ).encode()
@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.db import connection
+
+from .models import Pokemon, PokemonType, Move
+
+TABLE = "pokemons_pokemon_search"
+CHUNK_SIZE = 500
+# Joins the type and move names of a search document. A private use character
+# is a token of its own to FTS5, so that a phrase can't match across two names.
+SEPARATOR = " \ue000 "
+
+
+def is_available():
+    return connection.vendor == "sqlite"
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+# Turns user input into an FTS5 query that requires every term as a phrase
+# prefix, e.g. `thunder-pun fire` -> `"thunder-pun"* "fire"*`: the tokens of a
+# term must follow each other, its last one as a prefix.
+def match_query(search_terms):
+    return " ".join(
+        '"%s"*' % term.replace('"', '""')
+        for term in search_terms
+        if any(c.isalnum() for c in term)
+    )
+
+
+# Rewrites the search documents of `pokemon_ids`: one row per pokemon, keyed
+# by its id, holding its name and the names of its types and moves.
+def reindex(pokemon_ids):
+    if not is_available():
+        return
+
+    for ids in chunks(set(pokemon_ids)):
+        names = dict(Pokemon.objects.filter(pk__in=ids).values_list("pk", "name"))
+        types = defaultdict(list)
+        for pokemon_id, type in PokemonType.pokemons.through.objects.filter(
+            pokemon_id__in=ids
+        ).values_list("pokemon_id", "pokemontype__type"):
+            types[pokemon_id].append(type)
+        moves = defaultdict(list)
+        for pokemon_id, move in Move.pokemons.through.objects.filter(
+            pokemon_id__in=ids
+        ).values_list("pokemon_id", "move__name"):
+            moves[pokemon_id].append(move)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})",
+                ids,
+            )
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, name, types, moves) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    (pk, name, SEPARATOR.join(types[pk]), SEPARATOR.join(moves[pk]))
+                    for pk, name in names.items()
+                ],
+            )
+
+
+def reindex_all():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    for ids in chunks(Pokemon.objects.values_list("pk", flat=True).iterator()):
+        reindex(ids)
+
+
+def remove(pokemon_ids):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for ids in chunks(pokemon_ids):
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})",
+                ids,
+            )
+
+
+# Restricts `queryset` to pokemon matching every search term, ranked by bm25
+# relevance, through a join on the search table. The ranking is a regular
+# ordering, so keyset pagination can still replace it with its own.
+def search(queryset, search_terms):
+    query = match_query(search_terms)
+    if not query:
+        return queryset
+    return queryset.extra(
+        tables=[TABLE],
+        where=[f"{TABLE}.rowid = pokemons_pokemon.id", f"{TABLE} MATCH %s"],
+        params=[query],
+        select={"search_rank": f"{TABLE}.rank"},
+    ).order_by("search_rank", "id")
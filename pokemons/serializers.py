@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Pokemon, PokemonType, Move
+from .models import Pokemon, PokemonType, Move, MoveStats, TypeStats
+from .similarity import METRICS
+
+BEST_MOVES_MAX_IDS = 1000
 
 
 class PokemonSerializer(serializers.ModelSerializer):
@@ -9,11 +12,77 @@ class PokemonSerializer(serializers.ModelSerializer):
         model = Pokemon
         fields = ["id", "name", "order", "height", "weight", "types", "moves"]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if "types" in data:
+            data["types"] = sorted(data["types"])
+        return data
+
     def get_moves(self, obj):
-        moves = obj.moves.all().order_by("id")
+        # sorted in Python so a prefetched `moves` cache is used as is
+        moves = sorted(obj.moves.all(), key=lambda move: move.id)
         return [{"name": move.name, "power": move.power} for move in moves]
 
 
+class PokemonBestMoveSerializer(serializers.ModelSerializer):
+    best_move = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Pokemon
+        fields = ["id", "best_move"]
+
+    def get_best_move(self, obj):
+        if obj.best_move is None:
+            return None
+        return MoveSerializer(obj.best_move).data
+
+
+class BestMovesQuerySerializer(serializers.Serializer):
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(pk) for pk in value.split(",")]
+        except ValueError:
+            raise serializers.ValidationError("Expected comma separated ids.")
+        if len(ids) > BEST_MOVES_MAX_IDS:
+            raise serializers.ValidationError(
+                f"At most {BEST_MOVES_MAX_IDS} ids are allowed."
+            )
+        return list(dict.fromkeys(ids))
+
+
+class FieldsQuerySerializer(serializers.Serializer):
+    # `?fields=` of the list endpoints: a comma separated subset of the
+    # `fields` in the context, returned in their order
+    fields = serializers.CharField(required=False)
+
+    def validate_fields(self, value):
+        requested = {field.strip() for field in value.split(",") if field.strip()}
+        unknown = requested.difference(self.context["fields"])
+        if unknown:
+            raise serializers.ValidationError(
+                "Unknown fields: %s." % ", ".join(sorted(unknown))
+            )
+        if not requested:
+            raise serializers.ValidationError("Expected comma separated fields.")
+        return [field for field in self.context["fields"] if field in requested]
+
+
+class SimilarPokemonSerializer(PokemonSerializer):
+    common_moves = serializers.IntegerField(read_only=True)
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(PokemonSerializer.Meta):
+        fields = PokemonSerializer.Meta.fields + ["common_moves", "score"]
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    k = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    min_common = serializers.IntegerField(min_value=1, default=3)
+    metric = serializers.ChoiceField(choices=METRICS, default="shared")
+
+
 class PokemonTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = PokemonType
@@ -24,3 +93,51 @@ class MoveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Move
         fields = ["id", "name", "power"]
+
+
+class TypeStatsSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="type_id")
+    type = serializers.CharField(source="type.type")
+
+    class Meta:
+        model = TypeStats
+        fields = [
+            "id",
+            "type",
+            "pokemon_count",
+            "move_count",
+            "average_power",
+            "max_power",
+        ]
+
+
+class MoveStatsSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="move_id")
+    name = serializers.CharField(source="move.name")
+    power = serializers.IntegerField(source="move.power")
+
+    class Meta:
+        model = MoveStats
+        fields = ["id", "name", "power", "pokemon_count"]
+
+
+class PokemonBulkSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    order = serializers.IntegerField(min_value=0)
+    height = serializers.FloatField(min_value=0)
+    weight = serializers.FloatField(min_value=0)
+    types = serializers.ListField(
+        child=serializers.CharField(max_length=255), required=False
+    )
+    moves = serializers.ListField(
+        child=serializers.CharField(max_length=255), required=False
+    )
+
+
+class MoveBulkSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    power = serializers.IntegerField(min_value=0)
+
+
+class PokemonTypeBulkSerializer(serializers.Serializer):
+    type = serializers.CharField(max_length=255)
@@ -0,0 +1,161 @@
+from itertools import product
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search, stats
+from .cache import bump_version
+from .models import Pokemon, PokemonMoveCounts, PokemonType, Move, TypeMoveStats
+
+
+def affected_pokemon_ids(instance, reverse, pk_set):
+    if reverse:
+        return {instance.pk}
+    if pk_set is not None:
+        return set(pk_set)
+    return set(instance.pokemons.values_list("pk", flat=True))
+
+
+# The pokemon and the moves or types of the links about to be removed or
+# cleared; `pk_set` may name objects that are not linked.
+def unlinked_ids(through, column, instance, reverse, pk_set):
+    if reverse:
+        links = through.objects.filter(pokemon_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(**{f"{column}__in": pk_set})
+        return {instance.pk}, set(links.values_list(column, flat=True))
+    links = through.objects.filter(**{column: instance.pk})
+    if pk_set is not None:
+        links = links.filter(pokemon_id__in=pk_set)
+    return set(links.values_list("pokemon_id", flat=True)), {instance.pk}
+
+
+def pokemons_changed(through, column, instance, action, reverse, pk_set):
+    # `reverse` is True when the change was made from the pokemon side, e.g.
+    # through `pokemon.moves`. Returns the pokemon and the moves or types (the
+    # `column` of the `through` table) whose links were added or removed, every
+    # pair of one of each.
+    if action in ("pre_remove", "pre_clear"):
+        instance._unlinked_ids = unlinked_ids(
+            through, column, instance, reverse, pk_set
+        )
+    elif action in ("post_remove", "post_clear"):
+        return instance.__dict__.pop("_unlinked_ids", (set(), set()))
+    elif action == "post_add":
+        return (
+            affected_pokemon_ids(instance, reverse, pk_set),
+            set(pk_set) if reverse else {instance.pk},
+        )
+    return set(), set()
+
+
+def added_and_removed(action, pokemon_ids, linked_ids):
+    links = list(product(pokemon_ids, linked_ids))
+    return (links, []) if action == "post_add" else ([], links)
+
+
+@receiver(m2m_changed, sender=Move.pokemons.through)
+def move_pokemons_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    pokemon_ids, move_ids = pokemons_changed(
+        sender, "move_id", instance, action, reverse, pk_set
+    )
+    if pokemon_ids:
+        Pokemon.objects.filter(pk__in=pokemon_ids).refresh_move_summary()
+        search.reindex(pokemon_ids)
+        stats.refresh_moves(move_ids)
+        stats.move_links_changed(*added_and_removed(action, pokemon_ids, move_ids))
+
+
+@receiver(m2m_changed, sender=PokemonType.pokemons.through)
+def type_pokemons_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    pokemon_ids, type_ids = pokemons_changed(
+        sender, "pokemontype_id", instance, action, reverse, pk_set
+    )
+    if pokemon_ids:
+        search.reindex(pokemon_ids)
+        stats.type_links_changed(*added_and_removed(action, pokemon_ids, type_ids))
+
+
+@receiver(post_save, sender=Pokemon)
+def pokemon_saved(sender, instance, **kwargs):
+    search.reindex([instance.pk])
+
+
+# Deleting a pokemon cascades to its links without an m2m_changed signal.
+@receiver(pre_delete, sender=Pokemon)
+def pokemon_pre_delete(sender, instance, **kwargs):
+    instance._deleted_link_ids = (
+        set(instance.types.values_list("pk", flat=True)),
+        set(instance.moves.values_list("pk", flat=True)),
+        stats.pokemon_type_moves([instance.pk]),
+    )
+
+
+@receiver(post_delete, sender=Pokemon)
+def pokemon_deleted(sender, instance, **kwargs):
+    search.remove([instance.pk])
+    PokemonMoveCounts.store([(instance.pk, 0)])
+    type_ids, move_ids, type_moves = instance.__dict__.pop(
+        "_deleted_link_ids", (set(), set(), ())
+    )
+    stats.update_type_moves(removed=type_moves)
+    stats.refresh_types(type_ids)
+    stats.refresh_moves(move_ids)
+
+
+@receiver(post_save, sender=PokemonType)
+def type_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.refresh_types([instance.pk])
+    else:
+        search.reindex(instance.pokemons.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Move)
+def move_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.refresh_moves([instance.pk])
+    else:
+        if instance.has_changed("power"):
+            Pokemon.objects.filter(moves=instance).refresh_move_summary()
+            stats.refresh_types_of_moves([instance.pk])
+        if instance.has_changed("name"):
+            search.reindex(instance.pokemons.values_list("pk", flat=True))
+    instance._loaded_values = {"name": instance.name, "power": instance.power}
+
+
+# Deleting a move or type cascades to the through table without an
+# m2m_changed signal.
+@receiver(pre_delete, sender=Move)
+@receiver(pre_delete, sender=PokemonType)
+def related_pre_delete(sender, instance, **kwargs):
+    instance._deleted_pokemon_ids = affected_pokemon_ids(instance, False, None)
+    if sender is Move:
+        # its TypeMoveStats rows go with it
+        instance._deleted_type_ids = set(
+            TypeMoveStats.objects.filter(move=instance).values_list(
+                "type_id", flat=True
+            )
+        )
+
+
+@receiver(post_delete, sender=Move)
+@receiver(post_delete, sender=PokemonType)
+def related_post_delete(sender, instance, **kwargs):
+    pokemon_ids = instance.__dict__.pop("_deleted_pokemon_ids", set())
+    if sender is Move:
+        Pokemon.objects.filter(pk__in=pokemon_ids).refresh_move_summary()
+        stats.refresh_types(instance.__dict__.pop("_deleted_type_ids", set()))
+    search.reindex(pokemon_ids)
+
+
+def invalidate_responses(sender, action="post_save", **kwargs):
+    if action.startswith("post_"):
+        bump_version()
+
+
+for model in (Pokemon, PokemonType, Move):
+    post_save.connect(invalidate_responses, sender=model)
+    post_delete.connect(invalidate_responses, sender=model)
+for through in (PokemonType.pokemons.through, Move.pokemons.through):
+    m2m_changed.connect(invalidate_responses, sender=through)
@@ -0,0 +1,143 @@
+from .models import Pokemon, Move, MoveStats, PokemonMoveCounts
+
+METRICS = ["shared", "jaccard"]
+
+# the positions of the set bits of every byte
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+# A set of pokemon ids as bytes, bit `id` little-endian, as stored in
+# MoveStats.pokemon_bits.
+def bitset(pokemon_ids):
+    bits = bytearray()
+    for pokemon_id in pokemon_ids:
+        index = pokemon_id >> 3
+        if index >= len(bits):
+            bits.extend(bytes(index + 1 - len(bits)))
+        bits[index] |= 1 << (pokemon_id & 7)
+    return bytes(bits)
+
+
+def members(bits):
+    ids = []
+    for offset, byte in enumerate(
+        bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    ):
+        if byte:
+            ids.extend(offset * 8 + bit for bit in BYTE_BITS[byte])
+    return ids
+
+
+# Adds up the bitsets bit by bit: bit `id` of planes[j] is bit j of the number
+# of bitsets holding `id`.
+def count_bits(bitsets):
+    planes = []
+    for bits in bitsets:
+        carry = int.from_bytes(bits, "little")
+        for j, plane in enumerate(planes):
+            if not carry:
+                break
+            planes[j], carry = plane ^ carry, plane & carry
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+# The bits counted at least `count` times, `count` > 0.
+def at_least(planes, count):
+    if count >> len(planes):
+        return 0
+    greater, equal = 0, -1
+    for j in reversed(range(len(planes))):
+        if count >> j & 1:
+            equal &= planes[j]
+        else:
+            greater |= equal & planes[j]
+            equal &= ~planes[j]
+    return greater | equal
+
+
+def highest_count(planes):
+    count, bits = 0, -1
+    for j in reversed(range(len(planes))):
+        if bits & planes[j]:
+            bits &= planes[j]
+            count |= 1 << j
+    return count
+
+
+# Ranks the ids of the pokemon sharing at least `min_common` moves with
+# `pokemon`, as (pokemon id, common moves, score) ordered by score and id.
+#
+# MoveStats keeps a bitset of the pokemon that know each move, rewritten as
+# its links change, so candidates are counted by adding up the bitsets of the
+# pokemon's moves, one row each, instead of reading every link of those moves.
+# Candidates are then taken by decreasing count: for `shared` until there are
+# `k`, for `jaccard` until the count can no longer reach the k-th score, as a
+# candidate sharing `common` moves scores at most common / pokemon.move_count.
+# Jaccard scores read the move counts of the candidates from PokemonMoveCounts.
+def ranked_candidates(pokemon, k=10, min_common=3, metric="shared"):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+
+    through = Move.pokemons.through
+    bitsets = MoveStats.objects.filter(
+        move_id__in=through.objects.filter(pokemon_id=pokemon.pk).values("move_id")
+    ).values_list("pokemon_bits", flat=True)
+    itself = ~(1 << pokemon.pk)
+    planes = [plane & itself for plane in count_bits(bitsets)]
+
+    move_counts = PokemonMoveCounts.load() if metric == "jaccard" else None
+    ranked = []
+    above = 0
+    for common in range(highest_count(planes), min_common - 1, -1):
+        if metric == "jaccard" and len(ranked) == k:
+            if common / pokemon.move_count < ranked[-1][2]:
+                break
+        candidates = at_least(planes, common)
+        level, above = candidates & ~above, candidates
+        if not level:
+            continue
+        ids = members(level)
+
+        if metric == "shared":
+            ranked += [(pokemon_id, common, float(common)) for pokemon_id in ids]
+            if len(ranked) >= k:
+                break
+            continue
+
+        ranked += [
+            (
+                pokemon_id,
+                common,
+                common / (move_counts[pokemon_id] + pokemon.move_count - common),
+            )
+            for pokemon_id in ids
+        ]
+        ranked.sort(key=lambda row: (-row[2], row[0]))
+        del ranked[k:]
+    return ranked[:k]
+
+
+def similar_queryset(ranked):
+    return Pokemon.objects.prefetch_related("types", "moves").filter(
+        pk__in=[pokemon_id for pokemon_id, _, _ in ranked]
+    )
+
+
+# Orders the pokemon of `similar_queryset` like `ranked` and annotates them
+# with their shared move count and score.
+def rank(pokemons, ranked):
+    pokemons = {pokemon.pk: pokemon for pokemon in pokemons}
+    results = []
+    for pokemon_id, common_moves, score in ranked:
+        similar = pokemons[pokemon_id]
+        similar.common_moves = common_moves
+        similar.score = score
+        results.append(similar)
+    return results
+
+
+def similar_pokemon(pokemon, k=10, min_common=3, metric="shared"):
+    ranked = ranked_candidates(pokemon, k, min_common, metric)
+    return rank(similar_queryset(ranked), ranked)
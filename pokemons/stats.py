@@ -0,0 +1,204 @@
+from collections import Counter
+from itertools import chain
+
+from django.db.models import Avg, Count, Max
+
+from .models import (
+    Move,
+    MoveStats,
+    Pokemon,
+    PokemonMoveCounts,
+    PokemonType,
+    TypeMoveStats,
+    TypeStats,
+)
+from .projections import group
+from .search import chunks
+from .similarity import bitset
+
+TYPE_STATS_FIELDS = ["pokemon_count", "move_count", "average_power", "max_power"]
+
+
+# Derived from the type's rows of TypeMoveStats, one per distinct move, and
+# its own links for the pokemon count.
+def type_stats(type_id):
+    return TypeStats(
+        type_id=type_id,
+        pokemon_count=PokemonType.pokemons.through.objects.filter(
+            pokemontype_id=type_id
+        ).count(),
+        **TypeMoveStats.objects.filter(type_id=type_id).aggregate(
+            move_count=Count("pk"),
+            average_power=Avg("move__power"),
+            max_power=Max("move__power"),
+        ),
+    )
+
+
+# Recomputes the stats of `type_ids` (ids or a subquery of them), or of every
+# type.
+def refresh_types(type_ids=None):
+    types = PokemonType.objects.all()
+    if type_ids is not None:
+        types = types.filter(pk__in=type_ids)
+    TypeStats.objects.bulk_create(
+        [type_stats(type_id) for type_id in types.values_list("pk", flat=True)],
+        update_conflicts=True,
+        unique_fields=["type"],
+        update_fields=TYPE_STATS_FIELDS,
+    )
+
+
+# Recomputes the stats of the types known to have `move_ids`, e.g. after their
+# power changed.
+def refresh_types_of_moves(move_ids):
+    refresh_types(TypeMoveStats.objects.filter(move_id__in=move_ids).values("type_id"))
+
+
+def links_of(through, column, pokemon_ids):
+    for ids in chunks(set(pokemon_ids)):
+        yield from through.objects.filter(pokemon_id__in=ids).values_list(
+            "pokemon_id", column
+        )
+
+
+# Counts the (type id, move id) pairs of the pokemon in both `type_links` and
+# `move_links`, (pokemon id, type id) and (pokemon id, move id) pairs.
+def pair_counts(type_links, move_links):
+    moves = group(move_links)
+    return Counter(
+        (type_id, move_id)
+        for pokemon_id, type_id in type_links
+        for move_id in moves.get(pokemon_id, ())
+    )
+
+
+# Adds `added` to and subtracts `removed` from the TypeMoveStats counts, and
+# returns the ids of the types whose counts changed.
+def update_type_moves(added=(), removed=()):
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    deltas = {pair: delta for pair, delta in deltas.items() if delta}
+    counts = Counter()
+    for type_id, move_ids in group(deltas).items():
+        for ids in chunks(move_ids):
+            counts.update(
+                {
+                    (type_id, move_id): count
+                    for move_id, count in TypeMoveStats.objects.filter(
+                        type_id=type_id, move_id__in=ids
+                    ).values_list("move_id", "pokemon_count")
+                }
+            )
+    counts.update(deltas)
+
+    TypeMoveStats.objects.bulk_create(
+        [
+            TypeMoveStats(type_id=type_id, move_id=move_id, pokemon_count=count)
+            for (type_id, move_id), count in counts.items()
+            if count > 0
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["type", "move"],
+        update_fields=["pokemon_count"],
+    )
+    gone = group(pair for pair, count in counts.items() if count <= 0)
+    for type_id, move_ids in gone.items():
+        for ids in chunks(move_ids):
+            TypeMoveStats.objects.filter(type_id=type_id, move_id__in=ids).delete()
+    return {type_id for type_id, _ in deltas}
+
+
+# Applies added and removed (pokemon id, move id) links to the stats of the
+# types of their pokemon.
+def move_links_changed(added=(), removed=()):
+    type_links = list(
+        links_of(
+            PokemonType.pokemons.through,
+            "pokemontype_id",
+            (pokemon_id for pokemon_id, _ in chain(added, removed)),
+        )
+    )
+    refresh_types(
+        update_type_moves(
+            pair_counts(type_links, added), pair_counts(type_links, removed)
+        )
+    )
+
+
+# Applies added and removed (pokemon id, type id) links to the stats of their
+# types, with the moves their pokemon know now.
+def type_links_changed(added=(), removed=()):
+    move_links = list(
+        links_of(
+            Move.pokemons.through,
+            "move_id",
+            (pokemon_id for pokemon_id, _ in chain(added, removed)),
+        )
+    )
+    update_type_moves(pair_counts(added, move_links), pair_counts(removed, move_links))
+    refresh_types({type_id for _, type_id in chain(added, removed)})
+
+
+# The TypeMoveStats counts contributed by `pokemon_ids`, e.g. before they are
+# deleted.
+def pokemon_type_moves(pokemon_ids):
+    return pair_counts(
+        links_of(PokemonType.pokemons.through, "pokemontype_id", pokemon_ids),
+        links_of(Move.pokemons.through, "move_id", pokemon_ids),
+    )
+
+
+# Recounts the pokemon of `move_ids`, or of every move, and rewrites their
+# bitsets for similarity.ranked_candidates.
+def refresh_moves(move_ids=None):
+    moves = Move.objects.all()
+    if move_ids is not None:
+        moves = moves.filter(pk__in=move_ids)
+    for ids in chunks(moves.values_list("pk", flat=True)):
+        pokemon_ids = group(
+            Move.pokemons.through.objects.filter(move_id__in=ids)
+            .values_list("move_id", "pokemon_id")
+            .iterator()
+        )
+        MoveStats.objects.bulk_create(
+            [
+                MoveStats(
+                    move_id=pk,
+                    pokemon_count=len(pokemon_ids.get(pk, ())),
+                    pokemon_bits=bitset(pokemon_ids.get(pk, ())),
+                )
+                for pk in ids
+            ],
+            update_conflicts=True,
+            unique_fields=["move"],
+            update_fields=["pokemon_count", "pokemon_bits"],
+        )
+
+
+def rebuild_type_moves():
+    rows = (
+        Move.pokemons.through.objects.filter(pokemon__types__isnull=False)
+        .values("pokemon__types", "move_id")
+        .annotate(count=Count("pk"))
+        .values_list("pokemon__types", "move_id", "count")
+    )
+    TypeMoveStats.objects.bulk_create(
+        [
+            TypeMoveStats(type_id=type_id, move_id=move_id, pokemon_count=count)
+            for type_id, move_id, count in rows
+        ],
+        batch_size=500,
+    )
+
+
+def rebuild():
+    TypeStats.objects.all().delete()
+    MoveStats.objects.all().delete()
+    TypeMoveStats.objects.all().delete()
+    PokemonMoveCounts.objects.all().delete()
+    rebuild_type_moves()
+    refresh_types()
+    refresh_moves()
+    PokemonMoveCounts.store(Pokemon.objects.values_list("pk", "move_count"))
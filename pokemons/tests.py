@@ -1,9 +1,31 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.utils.cache import has_vary_header
 from django.core.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from .models import Pokemon, Move, PokemonType
+import poke_api
+from .bulk import save_moves, save_pokemon, sync_pokemon
+from . import metrics
+from .cache import VERSION_KEY, get_cache, get_version, stats
+from .db import REPLICA, ReadReplicaRouter, pragma, register_database
+from .models import Pokemon, Move, PokemonType, TypeMoveStats
+from .serializers import PokemonSerializer
+from .stats import rebuild as rebuild_stats
+from .views import ExportView
 
 
 class PokemonModelTestCase(TestCase):
@@ -221,3 +243,1216 @@ class PokemonTypeViewTestCase(TestCase):
         response = self.client.get("/types/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["results"][0]["type"], self.type1.type)
+
+
+class SyncPokemonTestCase(TestCase):
+    def setUp(self):
+        self.crawl = [
+            poke_api.Pokemon(
+                name="charizard",
+                order=7,
+                height=17,
+                weight=905,
+                types=[poke_api.Type("fire"), poke_api.Type("flying")],
+                moves=[poke_api.Move("ember", 40), poke_api.Move("fly", 90)],
+            ),
+            poke_api.Pokemon(
+                name="vulpix",
+                order=83,
+                height=6,
+                weight=99,
+                types=[poke_api.Type("fire")],
+                moves=[poke_api.Move("ember", 40), poke_api.Move("growl", None)],
+            ),
+        ]
+
+    def test_sync_creates_rows_and_links(self):
+        result = sync_pokemon(self.crawl)
+        self.assertEqual(result.created, {"types": 2, "moves": 3, "pokemons": 2})
+        self.assertEqual(result.links_added, 7)
+
+        charizard = Pokemon.objects.get(name="charizard")
+        self.assertEqual(charizard.weight, 905)
+        self.assertCountEqual(
+            charizard.types.values_list("type", flat=True), ["fire", "flying"]
+        )
+        self.assertCountEqual(
+            charizard.moves.values_list("name", flat=True), ["ember", "fly"]
+        )
+        self.assertEqual(Move.objects.get(name="growl").power, 0)
+
+    def test_sync_matches_existing_rows(self):
+        existing = Pokemon.objects.create(name="vulpix", order=1, height=1, weight=1)
+        PokemonType.objects.create(type="fire")
+
+        result = sync_pokemon(self.crawl)
+        self.assertEqual(result.created["pokemons"], 1)
+        self.assertEqual(result.updated["pokemons"], 1)
+        self.assertEqual(result.created["types"], 1)
+        existing.refresh_from_db()
+        self.assertEqual(existing.order, 83)
+
+    def test_resync_unchanged_is_read_only(self):
+        sync_pokemon(self.crawl)
+        # one SELECT per model and per through table inside a savepoint
+        with self.assertNumQueries(7):
+            result = sync_pokemon(self.crawl)
+        self.assertEqual(result.created, {"types": 0, "moves": 0, "pokemons": 0})
+        self.assertEqual(result.updated, {"types": 0, "moves": 0, "pokemons": 0})
+        self.assertEqual((result.links_added, result.links_removed), (0, 0))
+
+    def test_resync_diffs_membership(self):
+        sync_pokemon(self.crawl)
+        self.crawl[0].types = [poke_api.Type("fire")]
+        moves = list(self.crawl[0].moves)
+        moves[1] = poke_api.Move("fly", 95)
+        self.crawl[0].moves = moves
+
+        result = sync_pokemon(self.crawl)
+        self.assertEqual(result.updated["moves"], 1)
+        self.assertEqual((result.links_added, result.links_removed), (0, 1))
+        charizard = Pokemon.objects.get(name="charizard")
+        self.assertEqual(charizard.best_move.name, "fly")
+        self.assertEqual(list(charizard.types.values_list("type", flat=True)), ["fire"])
+        self.assertEqual(Move.objects.get(name="fly").power, 95)
+
+
+class PokemonQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        types = [PokemonType.objects.create(type=f"type-{i}") for i in range(3)]
+        self.type_ids = [type.id for type in types]
+        moves = [Move.objects.create(name=f"move-{i}", power=i * 10) for i in range(8)]
+        self.pokemons = []
+        for i in range(15):
+            pokemon = Pokemon.objects.create(
+                name=f"pokemon-{i}", order=i, height=1, weight=1
+            )
+            pokemon.types.add(*types[: i % 3 + 1])
+            pokemon.moves.add(*moves[: i % 8 + 1])
+            self.pokemons.append(pokemon)
+
+    def test_list_query_count(self):
+        # count, page, types, moves
+        with self.assertNumQueries(4):
+            response = self.client.get("/pokemons/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(response.data["results"][8]["types"], self.type_ids)
+        self.assertEqual(
+            response.data["results"][1]["moves"],
+            [{"name": "move-0", "power": 0}, {"name": "move-1", "power": 10}],
+        )
+
+    def test_filtered_list_query_count(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                "/pokemons/", {"types__type": "type-2", "moves__name": "move-1"}
+            )
+        names = [pokemon["name"] for pokemon in response.data["results"]]
+        self.assertEqual(len(names), len(set(names)))
+
+    def assertListed(self, params, indexes):
+        # the set filters are subqueries, so still count, page, types, moves
+        with self.assertNumQueries(4):
+            response = self.client.get("/pokemons/", params)
+        self.assertEqual(
+            [pokemon["name"] for pokemon in response.data["results"]],
+            [f"pokemon-{i}" for i in indexes],
+        )
+        self.assertEqual(response.data["count"], len(indexes))
+
+    def test_set_filters_query_count(self):
+        self.assertListed({"types": "type-1,type-2"}, [2, 5, 8, 11, 14])
+        self.assertListed(
+            {"types_any": "type-1,type-2"}, [1, 2, 4, 5, 7, 8, 10, 11, 13, 14]
+        )
+        self.assertListed({"moves": "move-6,move-7"}, [7])
+        self.assertListed({"moves_any": "move-6,move-7"}, [6, 7, 14])
+        self.assertListed(
+            {"types": "type-1,type-2", "moves_any": "move-6,move-7"}, [14]
+        )
+        self.assertListed({"types": "type-2,type-2"}, [2, 5, 8, 11, 14])
+
+    def test_move_power_filter_query_count(self):
+        self.assertListed({"move_power_min": 70}, [7])
+        self.assertListed(
+            {"move_power_min": 50, "move_power_max": 60}, [5, 6, 7, 13, 14]
+        )
+
+    def test_unknown_filter_values(self):
+        response = self.client.get("/pokemons/", {"types": "type-1,nope"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_move_power_range(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/moves/", {"power_min": 20, "power_max": 40})
+        self.assertEqual(
+            [move["name"] for move in response.data["results"]],
+            ["move-2", "move-3", "move-4"],
+        )
+
+    def test_detail_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/pokemons/{self.pokemons[7].id}/")
+        self.assertEqual(len(response.data["moves"]), 8)
+
+    def test_similar_query_count(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                f"/pokemons/{self.pokemons[7].id}/similar_pokemon/"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PokemonSimilarTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        self.moves = [Move.objects.create(name=f"move-{i}", power=10) for i in range(6)]
+        self.pokemon = Pokemon.objects.create(name="eevee", order=1, height=1, weight=1)
+        self.pokemon.moves.add(*self.moves[:5])
+        # shares 5 of 6 moves, 4 of 4 moves and 3 of 3 moves with eevee
+        self.many = self.create("many", self.moves)
+        self.most = self.create("most", self.moves[:4])
+        self.few = self.create("few", self.moves[2:5])
+        self.create("none", self.moves[5:])
+
+    def create(self, name, moves):
+        pokemon = Pokemon.objects.create(name=name, order=1, height=1, weight=1)
+        pokemon.moves.add(*moves)
+        return pokemon
+
+    def get(self, **params):
+        response = self.client.get(
+            f"/pokemons/{self.pokemon.id}/similar_pokemon/", params
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(pokemon["name"], pokemon["common_moves"]) for pokemon in response.data]
+
+    def test_ranked_by_shared_moves(self):
+        self.assertEqual(self.get(), [("many", 5), ("most", 4), ("few", 3)])
+
+    def test_ranked_by_jaccard(self):
+        # 5/6, 4/5 and 3/5
+        self.assertEqual(
+            self.get(metric="jaccard"), [("many", 5), ("most", 4), ("few", 3)]
+        )
+        self.few.moves.add(self.moves[5])
+        self.many.moves.remove(self.moves[0])
+        # 4/6, 4/5 and 3/6
+        self.assertEqual(
+            self.get(metric="jaccard"), [("most", 4), ("many", 4), ("few", 3)]
+        )
+
+    def test_k_and_min_common(self):
+        self.assertEqual(self.get(k=1), [("many", 5)])
+        self.assertEqual(self.get(min_common=4), [("many", 5), ("most", 4)])
+
+    def test_bitsets_track_link_changes(self):
+        self.many.delete()
+        self.moves[0].pokemons.add(self.few)
+        # 4/5 each, ties ordered by id
+        self.assertEqual(self.get(), [("most", 4), ("few", 4)])
+        self.assertEqual(self.get(metric="jaccard"), [("most", 4), ("few", 4)])
+
+        save_pokemon(
+            {"none": {"order": 1, "height": 1, "weight": 1}},
+            types={},
+            moves={"none": ["move-0", "move-1", "move-2"]},
+        )
+        expected = [("most", 4), ("few", 4), ("none", 3)]
+        self.assertEqual(self.get(metric="jaccard"), expected)
+        rebuild_stats()
+        self.assertEqual(self.get(metric="jaccard"), expected)
+
+    def test_invalid_params(self):
+        response = self.client.get(
+            f"/pokemons/{self.pokemon.id}/similar_pokemon/", {"metric": "cosine"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_count_tracks_m2m_changes(self):
+        self.many.refresh_from_db()
+        self.assertEqual(self.many.move_count, 6)
+
+        self.moves[0].pokemons.remove(self.many)
+        self.many.refresh_from_db()
+        self.assertEqual(self.many.move_count, 5)
+
+        self.many.moves.clear()
+        self.many.refresh_from_db()
+        self.assertEqual(self.many.move_count, 0)
+
+        self.moves[5].pokemons.clear()
+        self.moves[3].delete()
+        self.most.refresh_from_db()
+        self.assertEqual(self.most.move_count, 3)
+
+
+class PokemonBestMovesTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        self.ember = Move.objects.create(name="ember", power=40)
+        self.flamethrower = Move.objects.create(name="flamethrower", power=90)
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.moves.add(self.ember, self.flamethrower)
+        self.vulpix = Pokemon.objects.create(
+            name="vulpix", order=37, height=6, weight=99
+        )
+        self.vulpix.moves.add(self.ember)
+        self.magikarp = Pokemon.objects.create(
+            name="magikarp", order=129, height=9, weight=100
+        )
+
+    def best_move(self, pokemon):
+        pokemon.refresh_from_db()
+        return pokemon.best_move
+
+    def test_tracks_added_and_removed_moves(self):
+        self.assertEqual(self.best_move(self.charizard), self.flamethrower)
+        self.assertIsNone(self.best_move(self.magikarp))
+
+        self.flamethrower.pokemons.remove(self.charizard)
+        self.assertEqual(self.best_move(self.charizard), self.ember)
+
+        self.vulpix.moves.clear()
+        self.assertIsNone(self.best_move(self.vulpix))
+
+    def test_tracks_power_changes(self):
+        self.ember.power = 100
+        self.ember.save()
+        self.assertEqual(self.best_move(self.charizard), self.ember)
+
+        self.ember.delete()
+        self.assertEqual(self.best_move(self.charizard), self.flamethrower)
+        self.assertIsNone(self.best_move(self.vulpix))
+
+    def test_best_move_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/pokemons/{self.charizard.id}/best_move/")
+        self.assertEqual(response.data["name"], "flamethrower")
+
+    def test_batch_best_moves(self):
+        ids = [self.vulpix.id, 9999, self.charizard.id, self.magikarp.id]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/pokemons/best_moves/", {"ids": ",".join(map(str, ids))}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "id": self.vulpix.id,
+                    "best_move": {"id": self.ember.id, "name": "ember", "power": 40},
+                },
+                {
+                    "id": self.charizard.id,
+                    "best_move": {
+                        "id": self.flamethrower.id,
+                        "name": "flamethrower",
+                        "power": 90,
+                    },
+                },
+                {"id": self.magikarp.id, "best_move": None},
+            ],
+        )
+
+    def test_batch_best_moves_invalid_ids(self):
+        response = self.client.get("/pokemons/best_moves/", {"ids": "1,fire"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PokemonSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        fire = PokemonType.objects.create(type="fire")
+        water = PokemonType.objects.create(type="water")
+        self.ember = Move.objects.create(name="ember", power=40)
+        fire_punch = Move.objects.create(name="fire-punch", power=75)
+        surf = Move.objects.create(name="surf", power=90)
+
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.types.add(fire)
+        self.charizard.moves.add(self.ember, fire_punch)
+        self.squirtle = Pokemon.objects.create(
+            name="squirtle", order=7, height=5, weight=90
+        )
+        water.pokemons.add(self.squirtle)
+        self.squirtle.moves.add(surf, fire_punch)
+
+    def search(self, text):
+        response = self.client.get("/pokemons/", {"search": text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [pokemon["name"] for pokemon in response.data["results"]]
+
+    def test_search_names_types_and_moves(self):
+        self.assertEqual(self.search("charizard"), ["charizard"])
+        self.assertEqual(self.search("water"), ["squirtle"])
+        self.assertEqual(self.search("surf"), ["squirtle"])
+        self.assertEqual(self.search("emb"), ["charizard"])
+
+    def test_search_is_ranked_and_deduplicated(self):
+        # charizard matches "fire" in its type and in two moves
+        self.assertEqual(self.search("fire"), ["charizard", "squirtle"])
+        self.assertEqual(self.search("fire punch"), ["charizard", "squirtle"])
+        self.assertEqual(self.search("fire surf"), ["squirtle"])
+
+    def test_search_hyphenated_names(self):
+        thunder_shock = Move.objects.create(name="thunder-shock", power=40)
+        thunder_punch = Move.objects.create(name="thunder-punch", power=75)
+        self.charizard.moves.add(thunder_shock)
+        pikachu = Pokemon.objects.create(name="pikachu", order=25, height=4, weight=60)
+        pikachu.moves.add(thunder_punch)
+
+        self.assertEqual(self.search("thunder-punch"), ["pikachu"])
+        self.assertEqual(self.search("thunder-pun"), ["pikachu"])
+        self.assertCountEqual(self.search("fire-punch"), ["charizard", "squirtle"])
+        self.assertCountEqual(self.search('"thunder'), ["charizard", "pikachu"])
+        # names are not matched across each other
+        self.assertEqual(self.search("punch-surf"), [])
+        self.assertEqual(self.search("surf-fire"), [])
+        self.assertEqual(self.search("punch-thunder"), [])
+
+    def test_index_follows_writes(self):
+        self.ember.name = "flamethrower"
+        self.ember.save()
+        self.assertEqual(self.search("flame"), ["charizard"])
+        self.assertEqual(self.search("ember"), [])
+
+        self.charizard.moves.clear()
+        self.assertEqual(self.search("flame"), [])
+
+        self.squirtle.name = "wartortle"
+        self.squirtle.save()
+        self.assertEqual(self.search("wartortle"), ["wartortle"])
+
+        self.squirtle.delete()
+        self.assertEqual(self.search("surf"), [])
+
+    def test_search_with_filters(self):
+        response = self.client.get(
+            "/pokemons/", {"search": "fire", "types__type": "water"}
+        )
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["name"], "squirtle")
+
+    def test_synced_pokemon_are_indexed(self):
+        sync_pokemon(
+            [
+                poke_api.Pokemon(
+                    name="vulpix",
+                    order=37,
+                    height=6,
+                    weight=99,
+                    types=[poke_api.Type("fire")],
+                    moves=[poke_api.Move("quick-attack", 40)],
+                )
+            ]
+        )
+        self.assertEqual(self.search("quick"), ["vulpix"])
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        fire = PokemonType.objects.create(type="fire")
+        self.pokemons = []
+        for i in range(25):
+            pokemon = Pokemon.objects.create(
+                name=f"pokemon-{i}", order=i, height=1, weight=1
+            )
+            if i % 2:
+                pokemon.types.add(fire)
+            self.pokemons.append(pokemon)
+
+    def walk(self, url, params):
+        names = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [pokemon["name"] for pokemon in response.data["results"]]
+            if not response.data["next"]:
+                return names
+            response = self.client.get(response.data["next"])
+
+    def test_walk_all_pages(self):
+        names = self.walk("/pokemons/", {"cursor": ""})
+        self.assertEqual(names, [pokemon.name for pokemon in self.pokemons])
+
+    def test_walk_filtered_pages(self):
+        names = self.walk("/pokemons/", {"cursor": "", "types__type": "fire"})
+        self.assertEqual(names, [pokemon.name for pokemon in self.pokemons[1::2]])
+
+    def test_page_skips_count(self):
+        # page, types, moves
+        with self.assertNumQueries(3):
+            response = self.client.get("/pokemons/", {"cursor": ""})
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+    def test_optional_count(self):
+        response = self.client.get("/pokemons/", {"cursor": "", "count": "true"})
+        self.assertEqual(response.data["count"], 25)
+
+    def test_previous_page(self):
+        first = self.client.get("/pokemons/", {"cursor": ""})
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get("/types/")
+        self.assertEqual(response.data["count"], 1)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+        self.fire = PokemonType.objects.create(type="fire")
+        self.ember = Move.objects.create(name="ember", power=40)
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.types.add(self.fire)
+        self.charizard.moves.add(self.ember)
+
+    def test_hit_skips_database(self):
+        first = self.client.get("/pokemons/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get("/pokemons/")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Content-Type"], "application/json")
+
+    def test_if_none_match(self):
+        etag = self.client.get(f"/pokemons/{self.charizard.id}/")["ETag"]
+        response = self.client.get(
+            f"/pokemons/{self.charizard.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_writes_invalidate(self):
+        self.client.get("/pokemons/")
+        for write in [
+            lambda: self.charizard.moves.remove(self.ember),
+            lambda: self.fire.pokemons.clear(),
+            lambda: Move.objects.filter(pk=self.ember.pk).first().save(),
+            lambda: PokemonType.objects.create(type="water"),
+            lambda: self.charizard.delete(),
+        ]:
+            write()
+            response = self.client.get("/pokemons/")
+            self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_writes_through_api_invalidate(self):
+        self.client.get("/moves/")
+        self.client.post("/moves/create/", {"name": "surf", "power": 90})
+        response = self.client.get("/moves/")
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_accept_header_is_part_of_key(self):
+        self.client.get("/types/")
+        response = self.client.get("/types/", HTTP_ACCEPT="application/json; indent=4")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn(b"\n    ", response.content)
+
+    def test_browsable_api_not_shared(self):
+        url = f"/pokemons/{self.charizard.id}/"
+        first = self.client.get(url, HTTP_ACCEPT="text/html")
+        second = APIClient().get(url, HTTP_ACCEPT="text/html")
+        self.assertNotIn("X-Cache", second)
+        self.assertIn("csrftoken", second.cookies)
+        self.assertNotEqual(
+            first.cookies["csrftoken"].value, second.cookies["csrftoken"].value
+        )
+        self.assertTrue(has_vary_header(second, "Cookie"))
+
+    def test_version_survives_eviction(self):
+        self.client.get("/types/")
+        version = get_version()
+        get_cache().delete(VERSION_KEY)
+        self.assertNotEqual(get_version(), version)
+        self.assertEqual(self.client.get("/types/")["X-Cache"], "MISS")
+
+    def test_errors_are_not_cached(self):
+        self.client.get("/pokemons/9999/")
+        response = self.client.get("/pokemons/9999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("X-Cache", response)
+
+    def test_stats(self):
+        stats.pop("type-list", None)
+        self.client.get("/types/")
+        self.client.get("/types/")
+        self.assertEqual(stats["type-list"]["misses"], 1)
+        self.assertEqual(stats["type-list"]["hits"], 1)
+        self.assertGreater(stats["type-list"]["miss_seconds"], 0)
+        self.assertGreater(stats["type-list"]["hit_seconds"], 0)
+
+
+class BulkEndpointTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.default_format = "json"
+
+        self.ember = Move.objects.create(name="ember", power=40)
+        self.surf = Move.objects.create(name="surf", power=90)
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.moves.add(self.ember)
+
+    def test_bulk_pokemon(self):
+        payload = [
+            {
+                "name": "charizard",
+                "order": 6,
+                "height": 17,
+                "weight": 910,
+                "types": ["fire", "flying"],
+                "moves": ["ember", "surf"],
+            },
+            {
+                "name": "squirtle",
+                "order": 7,
+                "height": 5,
+                "weight": 90,
+                "types": ["water"],
+                "moves": ["surf"],
+            },
+        ]
+        response = self.client.post("/pokemons/bulk/", payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], {"types": 3, "pokemons": 1})
+        self.assertEqual(response.data["updated"], {"types": 0, "pokemons": 1})
+        self.assertEqual(response.data["links_added"], 5)
+        self.assertEqual(response.data["results"][0]["id"], self.charizard.id)
+
+        self.charizard.refresh_from_db()
+        self.assertEqual(self.charizard.weight, 910)
+        self.assertEqual(self.charizard.best_move, self.surf)
+        self.assertCountEqual(
+            self.charizard.types.values_list("type", flat=True), ["fire", "flying"]
+        )
+        squirtle = Pokemon.objects.get(name="squirtle")
+        self.assertEqual(list(squirtle.moves.all()), [self.surf])
+
+    def test_bulk_pokemon_diffs_membership(self):
+        payload = [
+            {
+                "name": "charizard",
+                "order": 6,
+                "height": 17,
+                "weight": 905,
+                "moves": ["surf"],
+            }
+        ]
+        response = self.client.post("/pokemons/bulk/", payload)
+        self.assertEqual(response.data["links_added"], 1)
+        self.assertEqual(response.data["links_removed"], 1)
+        self.assertEqual(list(self.charizard.moves.all()), [self.surf])
+
+        # omitted relations are left alone
+        del payload[0]["moves"]
+        response = self.client.post("/pokemons/bulk/", payload)
+        self.assertEqual(response.data["links_removed"], 0)
+        self.assertEqual(list(self.charizard.moves.all()), [self.surf])
+
+    def test_bulk_pokemon_errors_are_per_item(self):
+        payload = [
+            {"name": "squirtle", "order": 7, "height": 5, "weight": 90},
+            {"name": "wartortle", "order": -1, "height": 10, "weight": 225},
+            {
+                "name": "blastoise",
+                "order": 9,
+                "height": 16,
+                "weight": 855,
+                "moves": ["hydro-pump"],
+            },
+            {"name": "squirtle", "order": 7, "height": 5, "weight": 90},
+        ]
+        response = self.client.post("/pokemons/bulk/", payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("order", errors[1])
+        self.assertEqual(errors[2], {"moves": ["Unknown move: hydro-pump."]})
+        self.assertIn("name", errors[3])
+        self.assertFalse(Pokemon.objects.filter(name="squirtle").exists())
+
+    def test_bulk_pokemon_rejects_non_list(self):
+        response = self.client.post("/pokemons/bulk/", {"name": "squirtle"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_moves_update_best_moves(self):
+        response = self.client.post(
+            "/moves/bulk/",
+            [{"name": "ember", "power": 100}, {"name": "flamethrower", "power": 90}],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], {"moves": 1})
+        self.assertEqual(response.data["updated"], {"moves": 1})
+        self.assertEqual(Move.objects.get(name="ember").power, 100)
+
+    def test_bulk_types(self):
+        PokemonType.objects.create(type="fire")
+        response = self.client.post(
+            "/types/bulk/", [{"type": "fire"}, {"type": "water"}]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], {"types": 1})
+        self.assertEqual(
+            [item["type"] for item in response.data["results"]], ["fire", "water"]
+        )
+
+    def test_bulk_query_count_does_not_grow_with_items(self):
+        PokemonType.objects.create(type="normal")
+
+        def payload(prefix, count):
+            return [
+                {
+                    "name": f"{prefix}-{i}",
+                    "order": i,
+                    "height": 1,
+                    "weight": 1,
+                    "types": ["normal"],
+                    "moves": ["ember", "surf"],
+                }
+                for i in range(count)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post("/pokemons/bulk/", payload("small", 5))
+        with CaptureQueriesContext(connection) as large:
+            self.client.post("/pokemons/bulk/", payload("large", 50))
+        self.assertEqual(len(large), len(small))
+
+
+class AsyncViewTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        fire = PokemonType.objects.create(type="fire")
+        moves = [Move.objects.create(name=f"move-{i}", power=i * 10) for i in range(5)]
+        self.pokemons = []
+        for i in range(12):
+            pokemon = Pokemon.objects.create(
+                name=f"pokemon-{i}", order=i, height=1, weight=1
+            )
+            pokemon.types.add(fire)
+            pokemon.moves.add(*moves[: i % 5 + 1])
+            self.pokemons.append(pokemon)
+        self.pk = self.pokemons[4].pk
+
+    async def assertSameAsSync(self, path, params=None):
+        expected = await sync_to_async(self.client.get)(path, params)
+        response = await self.async_client.get(f"/async{path}", params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response["Content-Type"], expected["Content-Type"])
+        # rendered byte for byte like the sync views, but pagination links
+        # point back at the async route
+        self.assertEqual(response.content.replace(b"/async/", b"/"), expected.content)
+
+    async def test_list(self):
+        await self.assertSameAsSync("/pokemons/")
+        await self.assertSameAsSync("/pokemons/", {"page": 2})
+        await self.assertSameAsSync("/pokemons/", {"moves__name": "move-4"})
+        await self.assertSameAsSync("/pokemons/", {"search": "pokemon-1"})
+        await self.assertSameAsSync("/pokemons/", {"cursor": ""})
+        await self.assertSameAsSync("/pokemons/", {"page": 9})
+
+    async def test_list_fields(self):
+        await self.assertSameAsSync("/pokemons/", {"fields": "name,moves"})
+        await self.assertSameAsSync("/pokemons/", {"fields": "id", "cursor": ""})
+        await self.assertSameAsSync("/pokemons/", {"fields": "name,secret"})
+
+    async def test_detail(self):
+        await self.assertSameAsSync(f"/pokemons/{self.pk}/")
+        await self.assertSameAsSync("/pokemons/9999/")
+        # written unescaped, like the sync views do
+        flabebe = await Pokemon.objects.acreate(
+            name="flabébé", order=669, height=1, weight=1
+        )
+        await self.assertSameAsSync(f"/pokemons/{flabebe.pk}/")
+
+    async def test_best_move(self):
+        await self.assertSameAsSync(f"/pokemons/{self.pk}/best_move/")
+        await self.assertSameAsSync("/pokemons/9999/best_move/")
+
+    async def test_similar(self):
+        await self.assertSameAsSync(f"/pokemons/{self.pk}/similar_pokemon/")
+        await self.assertSameAsSync(
+            f"/pokemons/{self.pk}/similar_pokemon/", {"metric": "jaccard", "k": 2}
+        )
+        await self.assertSameAsSync(
+            f"/pokemons/{self.pk}/similar_pokemon/", {"metric": "cosine"}
+        )
+
+    async def test_only_get(self):
+        response = await self.async_client.delete(f"/async/pokemons/{self.pk}/")
+        self.assertEqual(response.status_code, 405)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.fire = PokemonType.objects.create(type="fire")
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.types.add(self.fire)
+
+    def series(self, histogram, route):
+        return list(histogram.series.get((route, "GET"), [0, 0.0]))
+
+    def test_records_request(self):
+        before = self.series(metrics.db_queries, "pokemon-detail")
+        response = self.client.get(f"/pokemons/{self.charizard.id}/")
+        after = self.series(metrics.db_queries, "pokemon-detail")
+        # one more request that ran 3 queries
+        self.assertEqual(sum(after[:-1]) - sum(before[:-1]), 1)
+        self.assertEqual(after[-1] - before[-1], 3)
+
+        size = self.series(metrics.response_size, "pokemon-detail")
+        self.assertGreaterEqual(size[-1], len(response.content))
+        self.assertTrue(self.series(metrics.render_duration, "pokemon-detail")[-1])
+
+    def test_exposition(self):
+        self.client.get("/types/")
+        self.client.get("/types/")
+        self.client.get("/types/9999/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE pokemons_http_request_duration_seconds histogram", lines)
+        for prefix in [
+            'pokemons_http_requests_total{route="type-list",method="GET",status="200"} ',
+            'pokemons_http_requests_total{route="type-detail",method="GET",status="404"} ',
+            'pokemons_http_request_duration_seconds_bucket{route="type-list",method="GET",le="+Inf"} ',
+            'pokemons_db_queries_count{route="type-list",method="GET"} ',
+            'pokemons_response_cache_hits_total{route="type-list"} ',
+            'pokemons_response_cache_hit_seconds_total{route="type-list"} ',
+            'pokemons_response_cache_miss_seconds_total{route="type-list"} ',
+        ]:
+            self.assertTrue(any(line.startswith(prefix) for line in lines), prefix)
+        self.assertIn(
+            'pokemons_response_cache_miss_seconds_total{route="type-list"} '
+            + metrics.format_value(stats["type-list"]["miss_seconds"]),
+            lines,
+        )
+        self.assertFalse(any('route="metrics"' in line for line in lines))
+
+    def test_async_capable(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(metrics.MetricsMiddleware(view)))
+        self.assertFalse(
+            iscoroutinefunction(metrics.MetricsMiddleware(lambda request: None))
+        )
+
+    async def test_records_async_request(self):
+        route = "async-pokemon-detail"
+        before = self.series(metrics.db_queries, route)
+        response = await self.async_client.get(f"/async/pokemons/{self.charizard.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        after = self.series(metrics.db_queries, route)
+        # the queries of the async ORM, run on its worker thread
+        self.assertEqual(sum(after[:-1]) - sum(before[:-1]), 1)
+        self.assertGreater(after[-1] - before[-1], 0)
+
+    def test_format_labels(self):
+        self.assertEqual(
+            metrics.format_labels(("route", "le"), ('a"b\\', 0.5)),
+            '{route="a\\"b\\\\",le="0.5"}',
+        )
+
+
+class DatabaseProfileTestCase(SimpleTestCase):
+    def test_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            register_database(
+                "pragmas",
+                {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": Path(directory) / "db.sqlite3",
+                    "PRAGMAS": settings.SQLITE_PRAGMAS,
+                },
+            )
+            try:
+                self.assertEqual(pragma("pragmas", "journal_mode"), "wal")
+                self.assertEqual(pragma("pragmas", "synchronous"), 1)
+                self.assertEqual(
+                    pragma("pragmas", "mmap_size"), settings.SQLITE_PRAGMAS["mmap_size"]
+                )
+            finally:
+                connections["pragmas"].close()
+                del connections["pragmas"]
+                del connections.settings["pragmas"]
+
+
+class ReadReplicaRouterTestCase(TransactionTestCase):
+    def test_without_replica(self):
+        default = settings.DATABASES["default"]
+        with mock.patch.dict(settings.DATABASES, {"default": default}, clear=True):
+            self.assertIsNone(ReadReplicaRouter().db_for_read(Pokemon))
+
+    def test_routing(self):
+        router = ReadReplicaRouter()
+        with mock.patch.dict(settings.DATABASES, {REPLICA: {}}):
+            self.assertEqual(router.db_for_read(Pokemon), REPLICA)
+            self.assertEqual(router.db_for_write(Pokemon), "default")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Pokemon), "default")
+        self.assertFalse(router.allow_migrate(REPLICA, "pokemons"))
+        self.assertTrue(router.allow_migrate("default", "pokemons"))
+
+
+class ProjectedListTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        types = [PokemonType.objects.create(type=f"type-{i}") for i in range(3)]
+        moves = [Move.objects.create(name=f"move-{i}", power=i * 10) for i in range(4)]
+        for i, (height, name) in enumerate(
+            [(17, "charizard"), (0.1, "flab\u00e9b\u00e9"), (2.5, "line\u2028sep")]
+        ):
+            pokemon = Pokemon.objects.create(
+                name=name, order=i, height=height, weight=i * 1.5
+            )
+            pokemon.types.add(*reversed(types[i:]))
+            pokemon.moves.add(*reversed(moves[i:]))
+
+    def expected(self):
+        pokemons = Pokemon.objects.prefetch_related("types", "moves").order_by("id")
+        return JSONRenderer().render(
+            {
+                "count": 3,
+                "next": None,
+                "previous": None,
+                "results": PokemonSerializer(pokemons, many=True).data,
+            }
+        )
+
+    def test_same_bytes_as_serializer(self):
+        expected = self.expected()
+        self.assertEqual(self.client.get("/pokemons/").content, expected)
+        get_cache().clear()
+        with mock.patch("pokemons.renderers.orjson", None):
+            self.assertEqual(self.client.get("/pokemons/").content, expected)
+
+    def test_inexact_floats(self):
+        Pokemon.objects.filter(name="charizard").update(weight=1e20)
+        self.assertIn(b'"weight":1e+20', self.client.get("/pokemons/").content)
+        self.assertEqual(self.client.get("/pokemons/").content, self.expected())
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/pokemons/", {"fields": "name,id"})
+        self.assertEqual(
+            list(response.json()["results"][0].items()),
+            [("id", Pokemon.objects.get(name="charizard").id), ("name", "charizard")],
+        )
+        with self.assertNumQueries(3):
+            response = self.client.get("/pokemons/", {"fields": "moves"})
+        self.assertEqual(
+            response.json()["results"][2],
+            {
+                "moves": [
+                    {"name": "move-2", "power": 20},
+                    {"name": "move-3", "power": 30},
+                ]
+            },
+        )
+
+    def test_sparse_fields_with_cursor(self):
+        response = self.client.get("/pokemons/", {"fields": "name", "cursor": ""})
+        self.assertEqual(
+            [row["name"] for row in response.json()["results"]][:1], ["charizard"]
+        )
+
+    def test_unknown_fields(self):
+        response = self.client.get("/pokemons/", {"fields": "name,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"fields": ["Unknown fields: secret."]})
+
+    def test_other_lists(self):
+        response = self.client.get("/moves/", {"fields": "power"})
+        self.assertEqual(
+            [row for row in response.json()["results"]],
+            [{"power": i * 10} for i in range(4)],
+        )
+        response = self.client.get("/types/")
+        self.assertEqual(response.json()["results"][0]["type"], "type-0")
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.fire = PokemonType.objects.create(type="fire")
+        self.flying = PokemonType.objects.create(type="flying")
+        self.moves = [
+            Move.objects.create(name=f"move-{i}", power=i * 10) for i in range(3)
+        ]
+        for i in range(5):
+            pokemon = Pokemon.objects.create(
+                name=f"pokemon-{i}", order=i, height=1.5, weight=i
+            )
+            pokemon.types.add(self.fire, *([self.flying] if i % 2 else []))
+            pokemon.moves.add(*self.moves[: i % 4])
+
+    def export(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, content = self.export("/pokemons/export/")
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        self.assertIn('filename="pokemons.ndjson"', response["Content-Disposition"])
+        pokemons = Pokemon.objects.prefetch_related("types", "moves").order_by("id")
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            json.loads(
+                JSONRenderer().render(PokemonSerializer(pokemons, many=True).data)
+            ),
+        )
+
+    async def test_streamed_over_asgi(self):
+        expected = await sync_to_async(self.export)("/pokemons/export/")
+        with mock.patch.object(ExportView, "chunk_size", 2):
+            response = await self.async_client.get("/pokemons/export/")
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        # five pokemon, sent in three chunks as they are read
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks).decode(), expected[1])
+
+    def test_chunked_queries(self):
+        with mock.patch.object(ExportView, "chunk_size", 2):
+            # a values(), a types and a moves query per chunk of 2
+            with self.assertNumQueries(9):
+                _, content = self.export("/pokemons/export/")
+            self.assertEqual(len(content.splitlines()), 5)
+            with self.assertNumQueries(3):
+                _, content = self.export("/pokemons/export/", fields="id")
+        first = Pokemon.objects.order_by("id").first()
+        self.assertEqual(content.splitlines()[0], f'{{"id":{first.id}}}')
+
+    def test_csv(self):
+        response, content = self.export("/pokemons/export/", format="csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(
+            rows[0], ["id", "name", "order", "height", "weight", "types", "moves"]
+        )
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            rows[2][1:6],
+            [
+                "pokemon-1",
+                "1",
+                "1.5",
+                "1.0",
+                json.dumps([self.fire.id, self.flying.id], separators=(",", ":")),
+            ],
+        )
+        self.assertEqual(
+            json.loads(rows[3][6]),
+            [{"name": "move-0", "power": 0}, {"name": "move-1", "power": 10}],
+        )
+
+    def test_accept_and_fields(self):
+        response = self.client.get(
+            "/moves/export/", {"fields": "name"}, HTTP_ACCEPT="text/csv"
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.split(), ["name", "move-0", "move-1", "move-2"])
+        _, content = self.export("/types/export/")
+        self.assertEqual(
+            json.loads(content.splitlines()[1]),
+            {"id": self.flying.id, "type": "flying"},
+        )
+
+    def test_unknown_fields(self):
+        for format in ["ndjson", "csv"]:
+            response = self.client.get(
+                "/types/export/", {"fields": "nope", "format": format}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            # errors are JSON, whatever the format
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertIn("fields", response.json())
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.fire = PokemonType.objects.create(type="fire")
+        self.flying = PokemonType.objects.create(type="flying")
+        self.ember = Move.objects.create(name="ember", power=40)
+        self.fly = Move.objects.create(name="fly", power=90)
+        self.tackle = Move.objects.create(name="tackle", power=40)
+        self.charizard = Pokemon.objects.create(
+            name="charizard", order=6, height=17, weight=905
+        )
+        self.charizard.types.add(self.fire, self.flying)
+        self.charizard.moves.add(self.ember, self.fly)
+        self.vulpix = Pokemon.objects.create(
+            name="vulpix", order=37, height=6, weight=99
+        )
+        self.vulpix.types.add(self.fire)
+        self.vulpix.moves.add(self.ember, self.tackle)
+
+    def type_stats(self):
+        return {
+            row["type"]: (
+                row["pokemon_count"],
+                row["move_count"],
+                row["average_power"],
+                row["max_power"],
+            )
+            for row in self.client.get("/types/stats/").json()["results"]
+        }
+
+    def move_stats(self):
+        return {
+            row["name"]: row["pokemon_count"]
+            for row in self.client.get("/moves/stats/").json()["results"]
+        }
+
+    def type_moves(self):
+        return set(
+            TypeMoveStats.objects.values_list(
+                "type__type", "move__name", "pokemon_count"
+            )
+        )
+
+    def assertRebuildAgrees(self):
+        expected = (self.type_stats(), self.move_stats(), self.type_moves())
+        rebuild_stats()
+        get_cache().clear()
+        self.assertEqual(
+            (self.type_stats(), self.move_stats(), self.type_moves()), expected
+        )
+
+    def test_stats(self):
+        self.assertEqual(
+            self.type_stats(),
+            {"fire": (2, 3, 170 / 3, 90), "flying": (1, 2, 65.0, 90)},
+        )
+        self.assertEqual(self.move_stats(), {"ember": 2, "fly": 1, "tackle": 1})
+        self.assertEqual(
+            self.type_moves(),
+            {
+                ("fire", "ember", 2),
+                ("fire", "fly", 1),
+                ("fire", "tackle", 1),
+                ("flying", "ember", 1),
+                ("flying", "fly", 1),
+            },
+        )
+        self.assertRebuildAgrees()
+
+    def test_query_count(self):
+        with self.assertNumQueries(2):
+            self.client.get("/types/stats/")
+        with self.assertNumQueries(2):
+            self.client.get("/moves/stats/")
+
+    def test_ordering(self):
+        response = self.client.get("/moves/stats/", {"ordering": "-pokemon_count"})
+        self.assertEqual(
+            [row["name"] for row in response.json()["results"]],
+            ["ember", "fly", "tackle"],
+        )
+        response = self.client.get(
+            "/types/stats/", {"ordering": "pokemon_count", "cursor": ""}
+        )
+        self.assertEqual(
+            [row["type"] for row in response.json()["results"]], ["flying", "fire"]
+        )
+
+    def test_link_changes(self):
+        # fly is not a move of vulpix
+        self.vulpix.moves.remove(self.tackle, self.fly)
+        self.flying.pokemons.add(self.vulpix)
+        self.assertEqual(
+            self.type_stats(),
+            {"fire": (2, 2, 65.0, 90), "flying": (2, 2, 65.0, 90)},
+        )
+        self.assertEqual(self.move_stats(), {"ember": 2, "fly": 1, "tackle": 0})
+
+        self.charizard.moves.clear()
+        self.fire.pokemons.clear()
+        self.assertEqual(
+            self.type_stats(),
+            {"fire": (0, 0, None, None), "flying": (2, 1, 40.0, 40)},
+        )
+        self.assertEqual(self.move_stats(), {"ember": 1, "fly": 0, "tackle": 0})
+        self.assertRebuildAgrees()
+
+    def test_power_change_and_deletes(self):
+        self.fly.power = 120
+        self.fly.save()
+        self.assertEqual(self.type_stats()["flying"], (1, 2, 80.0, 120))
+
+        self.ember.delete()
+        self.assertEqual(self.type_stats()["fire"], (2, 2, 80.0, 120))
+
+        self.charizard.delete()
+        self.assertEqual(
+            self.type_stats(),
+            {"fire": (1, 1, 40.0, 40), "flying": (0, 0, None, None)},
+        )
+        self.assertEqual(self.move_stats(), {"fly": 0, "tackle": 1})
+
+        Move.objects.create(name="surf", power=90)
+        PokemonType.objects.create(type="water")
+        self.assertEqual(self.move_stats()["surf"], 0)
+        self.assertEqual(self.type_stats()["water"], (0, 0, None, None))
+        self.assertRebuildAgrees()
+
+    def test_bulk_writes(self):
+        save_moves({"surf": {"power": 90}, "ember": {"power": 60}})
+        save_pokemon(
+            {
+                "squirtle": {"order": 7, "height": 5, "weight": 90},
+                "vulpix": {"order": 37, "height": 6, "weight": 99},
+            },
+            types={"squirtle": ["water"], "vulpix": ["fire", "flying"]},
+            moves={"squirtle": ["surf", "tackle"]},
+        )
+        self.assertEqual(
+            self.type_stats(),
+            {
+                "fire": (2, 3, 190 / 3, 90),
+                "flying": (2, 3, 190 / 3, 90),
+                "water": (1, 2, 65.0, 90),
+            },
+        )
+        self.assertEqual(
+            self.move_stats(), {"ember": 2, "fly": 1, "tackle": 2, "surf": 1}
+        )
+        self.assertRebuildAgrees()
@@ -1,23 +1,46 @@
 from django.urls import path
+from . import async_views
+from .metrics import metrics_view
+from .cache import cache_response
 from .views import (
     PokemonListView,
     PokemonCreateView,
     PokemonDetailView,
     PokemonBestMoveView,
+    PokemonBestMovesView,
     PokemonSimilarView,
+    PokemonBulkView,
+    PokemonExportView,
     MoveListView,
     MoveCreateView,
     MoveDetailView,
+    MoveBulkView,
+    MoveExportView,
+    MoveStatsView,
     PokemonTypeListView,
     PokemonTypeCreateView,
     PokemonTypeDetailView,
+    PokemonTypeBulkView,
+    PokemonTypeExportView,
+    TypeStatsView,
 )
 
 
 urlpatterns = [
-    path("pokemons/", PokemonListView.as_view(), name="pokemon-list"),
+    path("pokemons/", cache_response(PokemonListView.as_view()), name="pokemon-list"),
     path("pokemons/create/", PokemonCreateView.as_view(), name="pokemon-create"),
-    path("pokemons/<int:pk>/", PokemonDetailView.as_view(), name="pokemon-detail"),
+    path("pokemons/bulk/", PokemonBulkView.as_view(), name="pokemon-bulk"),
+    path("pokemons/export/", PokemonExportView.as_view(), name="pokemon-export"),
+    path(
+        "pokemons/<int:pk>/",
+        cache_response(PokemonDetailView.as_view()),
+        name="pokemon-detail",
+    ),
+    path(
+        "pokemons/best_moves/",
+        PokemonBestMovesView.as_view(),
+        name="pokemon-best-moves",
+    ),
     path(
         "pokemons/<int:pk>/best_move/",
         PokemonBestMoveView.as_view(),
@@ -28,10 +51,33 @@ urlpatterns = [
         PokemonSimilarView.as_view(),
         name="pokemon-similar",
     ),
-    path("moves/", MoveListView.as_view(), name="move-list"),
+    path("async/pokemons/", async_views.pokemon_list, name="async-pokemon-list"),
+    path(
+        "async/pokemons/<int:pk>/",
+        async_views.pokemon_detail,
+        name="async-pokemon-detail",
+    ),
+    path(
+        "async/pokemons/<int:pk>/best_move/",
+        async_views.pokemon_best_move,
+        name="async-pokemon-best-move",
+    ),
+    path(
+        "async/pokemons/<int:pk>/similar_pokemon/",
+        async_views.pokemon_similar,
+        name="async-pokemon-similar",
+    ),
+    path("moves/", cache_response(MoveListView.as_view()), name="move-list"),
     path("moves/create/", MoveCreateView.as_view(), name="move-create"),
+    path("moves/bulk/", MoveBulkView.as_view(), name="move-bulk"),
+    path("moves/export/", MoveExportView.as_view(), name="move-export"),
+    path("moves/stats/", cache_response(MoveStatsView.as_view()), name="move-stats"),
     path("moves/<int:pk>/", MoveDetailView.as_view(), name="move-detail"),
-    path("types/", PokemonTypeListView.as_view(), name="type-list"),
+    path("types/", cache_response(PokemonTypeListView.as_view()), name="type-list"),
     path("types/create/", PokemonTypeCreateView.as_view(), name="type-create"),
+    path("types/bulk/", PokemonTypeBulkView.as_view(), name="type-bulk"),
+    path("types/export/", PokemonTypeExportView.as_view(), name="type-export"),
+    path("types/stats/", cache_response(TypeStatsView.as_view()), name="type-stats"),
     path("types/<int:pk>/", PokemonTypeDetailView.as_view(), name="type-detail"),
+    path("metrics", metrics_view, name="metrics"),
 ]
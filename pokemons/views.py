@@ -1,19 +1,52 @@
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from rest_framework import filters
 from rest_framework import generics
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Pokemon, PokemonType, Move
-from .serializers import PokemonSerializer, PokemonTypeSerializer, MoveSerializer
-from django.db.models import Count
+from .bulk import save_moves, save_pokemon, save_types
+from .filters import (
+    MoveFilterSet,
+    PokemonFilterSet,
+    PokemonSearchFilter,
+    StableOrderingFilter,
+)
+from .models import Pokemon, PokemonType, Move, MoveStats, TypeStats
+from .projections import (
+    EXPORT_CHUNK_SIZE,
+    ProjectedListMixin,
+    export_chunks,
+    pokemon_moves,
+    pokemon_types,
+    requested_fields,
+)
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (
+    PokemonSerializer,
+    PokemonTypeSerializer,
+    MoveSerializer,
+    BestMovesQuerySerializer,
+    PokemonBestMoveSerializer,
+    SimilarPokemonSerializer,
+    SimilarQuerySerializer,
+    PokemonBulkSerializer,
+    MoveBulkSerializer,
+    PokemonTypeBulkSerializer,
+    TypeStatsSerializer,
+    MoveStatsSerializer,
+)
+from .similarity import similar_pokemon
 
 
 class PokemonBestMoveView(APIView):
     def get(self, request, pk, format=None):
-        pokemon = Pokemon.objects.filter(id=pk).first()
+        pokemon = Pokemon.objects.select_related("best_move").filter(id=pk).first()
         if pokemon:
-            best_move = pokemon.moves.order_by("-power").first()
+            best_move = pokemon.best_move
             if best_move:
                 serializer = MoveSerializer(best_move)
                 return Response(serializer.data, status=status.HTTP_200_OK)
@@ -28,18 +61,28 @@ class PokemonBestMoveView(APIView):
             )
 
 
+class PokemonBestMovesView(APIView):
+    def get(self, request, format=None):
+        query = BestMovesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        pokemons = Pokemon.objects.select_related("best_move").in_bulk(
+            query.validated_data["ids"]
+        )
+        serializer = PokemonBestMoveSerializer(
+            [pokemons[pk] for pk in query.validated_data["ids"] if pk in pokemons],
+            many=True,
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class PokemonSimilarView(APIView):
     def get(self, request, pk, format=None):
         pokemon = Pokemon.objects.filter(id=pk).first()
         if pokemon:
-            moves = pokemon.moves.all()
-            similar_pokemons = (
-                Pokemon.objects.filter(moves__in=moves)
-                .exclude(id=pokemon.id)
-                .annotate(common_moves=Count("moves"))
-                .filter(common_moves__gte=3)
-            )
-            serializer = PokemonSerializer(similar_pokemons, many=True)
+            query = SimilarQuerySerializer(data=request.query_params)
+            query.is_valid(raise_exception=True)
+            similar_pokemons = similar_pokemon(pokemon, **query.validated_data)
+            serializer = SimilarPokemonSerializer(similar_pokemons, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(
@@ -47,12 +90,13 @@ class PokemonSimilarView(APIView):
             )
 
 
-class PokemonListView(generics.ListAPIView):
-    queryset = Pokemon.objects.all().order_by("id")
+class PokemonListView(ProjectedListMixin, generics.ListAPIView):
+    queryset = Pokemon.objects.prefetch_related("types", "moves").order_by("id")
     serializer_class = PokemonSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ["types__type", "moves__name"]
-    search_fields = ["types__type", "moves__name"]
+    projections = {"types": pokemon_types, "moves": pokemon_moves}
+    filter_backends = [DjangoFilterBackend, PokemonSearchFilter]
+    filterset_class = PokemonFilterSet
+    search_fields = ["name", "types__type", "moves__name"]
 
 
 class PokemonCreateView(generics.CreateAPIView):
@@ -61,13 +105,15 @@ class PokemonCreateView(generics.CreateAPIView):
 
 
 class PokemonDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Pokemon.objects.all()
+    queryset = Pokemon.objects.prefetch_related("types", "moves")
     serializer_class = PokemonSerializer
 
 
-class MoveListView(generics.ListAPIView):
+class MoveListView(ProjectedListMixin, generics.ListAPIView):
     queryset = Move.objects.all().order_by("id")
     serializer_class = MoveSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = MoveFilterSet
 
 
 class MoveCreateView(generics.CreateAPIView):
@@ -80,7 +126,7 @@ class MoveDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MoveSerializer
 
 
-class PokemonTypeListView(generics.ListAPIView):
+class PokemonTypeListView(ProjectedListMixin, generics.ListAPIView):
     queryset = PokemonType.objects.all().order_by("id")
     serializer_class = PokemonTypeSerializer
 
@@ -93,3 +139,188 @@ class PokemonTypeCreateView(generics.CreateAPIView):
 class PokemonTypeDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = PokemonType.objects.all()
     serializer_class = PokemonTypeSerializer
+
+
+class TypeStatsView(generics.ListAPIView):
+    queryset = TypeStats.objects.select_related("type")
+    serializer_class = TypeStatsSerializer
+    filter_backends = [StableOrderingFilter]
+    ordering_fields = ["pokemon_count", "move_count", "average_power", "max_power"]
+    ordering = ["type"]
+
+
+class MoveStatsView(generics.ListAPIView):
+    queryset = MoveStats.objects.select_related("move").defer("pokemon_bits")
+    serializer_class = MoveStatsSerializer
+    filter_backends = [StableOrderingFilter]
+    ordering_fields = ["pokemon_count"]
+    ordering = ["move"]
+
+
+class BulkUpsertView(ABC, APIView):
+    # Creates or updates a list of items matched on their unique `key` field
+    # in one transaction. Nothing is written unless every item is valid; the
+    # errors are reported per item, in request order. Subclasses implement
+    # `save`, returning the ids by key and the bulk.SyncResult.
+    item_serializer_class = None
+    key = "name"
+    max_items = 1000
+
+    def post(self, request, format=None):
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "Expected a list of items."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > self.max_items:
+            return Response(
+                {"detail": f"At most {self.max_items} items are allowed."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        items, errors, seen = [], [], set()
+        for data in request.data:
+            serializer = self.item_serializer_class(data=data)
+            if not serializer.is_valid():
+                items.append(None)
+                errors.append(serializer.errors)
+                continue
+            item = serializer.validated_data
+            if item[self.key] in seen:
+                items.append(None)
+                errors.append({self.key: ["Duplicate item in this request."]})
+                continue
+            seen.add(item[self.key])
+            items.append(item)
+            errors.append({})
+
+        self.validate_items(items, errors)
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids, result = self.save(items)
+        return Response(
+            {
+                "results": [
+                    {"id": ids[item[self.key]], self.key: item[self.key]}
+                    for item in items
+                ],
+                "created": result.created,
+                "updated": result.updated,
+                "links_added": result.links_added,
+                "links_removed": result.links_removed,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def validate_items(self, items, errors):
+        pass
+
+    @abstractmethod
+    def save(self, items):
+        pass
+
+
+class PokemonBulkView(BulkUpsertView):
+    item_serializer_class = PokemonBulkSerializer
+
+    def validate_items(self, items, errors):
+        names = {move for item in items if item for move in item.get("moves", [])}
+        known = set(Move.objects.filter(name__in=names).values_list("name", flat=True))
+        for item, item_errors in zip(items, errors):
+            unknown = [
+                move for move in (item or {}).get("moves", []) if move not in known
+            ]
+            if unknown:
+                item_errors["moves"] = [f"Unknown move: {move}." for move in unknown]
+
+    def save(self, items):
+        return save_pokemon(
+            {
+                item["name"]: {
+                    "order": item["order"],
+                    "height": item["height"],
+                    "weight": item["weight"],
+                }
+                for item in items
+            },
+            types={item["name"]: item["types"] for item in items if "types" in item},
+            moves={item["name"]: item["moves"] for item in items if "moves" in item},
+        )
+
+
+class MoveBulkView(BulkUpsertView):
+    item_serializer_class = MoveBulkSerializer
+
+    def save(self, items):
+        return save_moves({item["name"]: {"power": item["power"]} for item in items})
+
+
+class PokemonTypeBulkView(BulkUpsertView):
+    item_serializer_class = PokemonTypeBulkSerializer
+    key = "type"
+
+    def save(self, items):
+        return save_types([item["type"] for item in items])
+
+
+# Yields the items of a sync iterator that queries the database, each one
+# fetched through sync_to_async on the thread the ORM uses under ASGI.
+async def iterate_async(iterator):
+    next_item = sync_to_async(next)
+    done = object()
+    while (item := await next_item(iterator, done)) is not done:
+        yield item
+
+
+class ExportView(APIView):
+    # Streams every row of `queryset` as NDJSON or CSV (?format= or Accept), in
+    # the shape of `serializer_class` and with ?fields= like the lists. Rows
+    # are read in chunks as the response is sent, so each chunk is consistent
+    # but the export as a whole is not a snapshot. Over ASGI the chunks are
+    # streamed from an async iterator, as Django would read a sync one whole
+    # before sending anything.
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    queryset = None
+    serializer_class = None
+    projections = {}
+    filename = None
+    chunk_size = EXPORT_CHUNK_SIZE
+
+    def get(self, request, format=None):
+        fields = requested_fields(request, self.serializer_class.Meta.fields)
+        renderer = request.accepted_renderer
+        content = renderer.stream(
+            export_chunks(
+                self.queryset.all(), fields, self.projections, self.chunk_size
+            ),
+            fields,
+        )
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_async(content)
+        response = StreamingHttpResponse(
+            content, content_type=f"{renderer.media_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.filename}.{renderer.format}"'
+        )
+        return response
+
+
+class PokemonExportView(ExportView):
+    queryset = Pokemon.objects.all()
+    serializer_class = PokemonSerializer
+    projections = PokemonListView.projections
+    filename = "pokemons"
+
+
+class MoveExportView(ExportView):
+    queryset = Move.objects.all()
+    serializer_class = MoveSerializer
+    filename = "moves"
+
+
+class PokemonTypeExportView(ExportView):
+    queryset = PokemonType.objects.all()
+    serializer_class = PokemonTypeSerializer
+    filename = "types"
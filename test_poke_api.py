@@ -0,0 +1,541 @@
+import asyncio
+import contextlib
+import email.utils
+import json
+import tempfile
+import time
+import unittest
+from array import array
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+import poke_api
+from poke_api_standin import RecordedCorpus, StandInServer, SyntheticCatalog
+
+
+class StandInCorpus:
+    # A small catalog with known answers: every type lists pokemon 0 to 3,
+    # every named move pokemon 0 and 1, and each pokemon has type 1 and
+    # moves 0 to 2.
+
+    def __init__(self, catalog_size):
+        self.catalog_size = catalog_size
+
+    def data(self, base, kind, key, query):
+        match kind:
+            case "pokemon" if not key:
+                limit, offset = int(query["limit"][0]), int(query["offset"][0])
+                count = self.catalog_size
+                next_offset = offset + limit
+                return {
+                    "count": count,
+                    "next": (
+                        f"{base}/pokemon/?limit={limit}&offset={next_offset}"
+                        if next_offset < count
+                        else None
+                    ),
+                    "results": [
+                        {"name": f"pokemon-{i}", "url": f"{base}/pokemon/{i}/"}
+                        for i in range(offset, min(next_offset, count))
+                    ],
+                }
+            case "type":
+                return {
+                    "name": key,
+                    "pokemon": [
+                        {"pokemon": {"url": f"{base}/pokemon/{i}/"}} for i in range(4)
+                    ],
+                }
+            case "move" if not key.isdigit():
+                return {
+                    "name": key,
+                    "learned_by_pokemon": [
+                        {"url": f"{base}/pokemon/{i}/"} for i in range(2)
+                    ],
+                }
+            case "pokemon":
+                return {
+                    "name": f"pokemon-{key}",
+                    "order": int(key),
+                    "height": 7,
+                    "weight": 69,
+                    "types": [{"type": {"url": f"{base}/type/1/"}}],
+                    "moves": [{"move": {"url": f"{base}/move/{i}/"}} for i in range(3)],
+                }
+            case "move":
+                return {"name": f"move-{key}", "power": int(key) * 10}
+
+    def document(self, base_url, path):
+        url = urlsplit(path)
+        kind, _, key = url.path.strip("/").partition("/")
+        data = self.data(base_url, kind, key, parse_qs(url.query))
+        return json.dumps(data).encode()
+
+
+class StandInServerTestCase(unittest.TestCase):
+    latency = 0.01
+    catalog_size = 5
+
+    def setUp(self):
+        self.server = self.enterContext(
+            StandInServer(StandInCorpus(self.catalog_size), latency=self.latency)
+        )
+
+        patcher = mock.patch.multiple(poke_api, BASE_URL=self.server.base_url, LIMIT=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class FetcherTestCase(StandInServerTestCase):
+    def test_fetch_by_type(self):
+        pokemon_list = asyncio.run(poke_api.get_pokemon_by_type("fire"))
+        self.assertEqual(len(pokemon_list), 4)
+        self.assertEqual(pokemon_list[0].name, "pokemon-0")
+        self.assertEqual(pokemon_list[3].order, 3)
+        self.assertEqual(pokemon_list[0].types, (poke_api.Type(name="1"),))
+        self.assertEqual(
+            pokemon_list[0].moves,
+            tuple(poke_api.Move(name=f"move-{i}", power=i * 10) for i in range(3)),
+        )
+
+    def test_types_and_moves_shared(self):
+        first, second, *_ = asyncio.run(poke_api.get_pokemon_by_type("fire"))
+        self.assertIs(first.types[0], second.types[0])
+        self.assertIs(first.moves[2], second.moves[2])
+        self.assertIsInstance(first._move_ids, array)
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertFalse(hasattr(first.moves[0], "__dict__"))
+        # edits must go through the setter
+        with self.assertRaises(TypeError):
+            first.moves[0] = poke_api.Move("fly", 95)
+
+    def test_as_dict(self):
+        pokemon, *_ = asyncio.run(poke_api.get_pokemon_by_type("fire"))
+        self.assertEqual(
+            pokemon.as_dict(),
+            {
+                "name": "pokemon-0",
+                "order": 0,
+                "height": 7,
+                "weight": 69,
+                "types": [{"name": "1"}],
+                "moves": [{"name": f"move-{i}", "power": i * 10} for i in range(3)],
+            },
+        )
+
+    def test_limit(self):
+        with mock.patch.object(poke_api, "LIMIT", 1):
+            pokemon_list = asyncio.run(poke_api.get_pokemon_by_move("surf"))
+        self.assertEqual(len(pokemon_list), 1)
+
+    def test_limit_and_offset(self):
+        async def collect():
+            return [
+                pokemon.name
+                async for pokemon in poke_api.iter_pokemon_by_type(
+                    "fire", limit=2, offset=1
+                )
+            ]
+
+        self.assertCountEqual(asyncio.run(collect()), ["pokemon-1", "pokemon-2"])
+        self.assertNotIn("/pokemon/0/", self.server.requests)
+        self.assertNotIn("/pokemon/3/", self.server.requests)
+
+    def test_limit_per_call(self):
+        with mock.patch.object(poke_api, "LIMIT", 1):
+            pokemon_list = asyncio.run(poke_api.get_pokemon_by_type("fire", limit=0))
+        self.assertEqual(len(pokemon_list), 4)
+
+        pokemon_list = asyncio.run(poke_api.get_pokemon_by_move("surf", offset=1))
+        self.assertEqual([pokemon.name for pokemon in pokemon_list], ["pokemon-1"])
+
+    def test_negative_limit(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(poke_api.get_pokemon_by_type("fire", limit=-1))
+
+    def test_cancelled_download_not_sent(self):
+        base = self.server.base_url
+
+        async def cancel_queued():
+            fetcher = poke_api.Fetcher(concurrency=1)
+            first = asyncio.ensure_future(fetcher.get_json(f"{base}/move/1/"))
+            second = asyncio.ensure_future(fetcher.get_json(f"{base}/move/2/"))
+            while not fetcher._started:
+                await asyncio.sleep(0)
+            # the first download holds the only slot, the second is queued
+            second.cancel()
+            await first
+            await asyncio.sleep(self.latency * 2)
+            self.assertTrue(second.cancelled())
+            self.assertNotIn("/move/2/", self.server.requests)
+            self.assertEqual(fetcher._inflight, {})
+            return await fetcher.get_json(f"{base}/move/2/")
+
+        self.assertEqual(asyncio.run(cancel_queued())["name"], "move-2")
+        self.assertEqual(self.server.requests["/move/2/"], 1)
+
+    def test_shared_download_survives_cancelled_caller(self):
+        url = f"{self.server.base_url}/move/1/"
+
+        async def cancel_one():
+            fetcher = poke_api.Fetcher(concurrency=1)
+            first = asyncio.ensure_future(fetcher.get_json(url))
+            second = asyncio.ensure_future(fetcher.get_json(url))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(cancel_one())["name"], "move-1")
+        self.assertEqual(self.server.requests["/move/1/"], 1)
+
+    def test_concurrency_cap(self):
+        fetcher = poke_api.Fetcher(concurrency=2)
+        asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertLessEqual(self.server.max_active, 2)
+
+    def test_each_url_fetched_once(self):
+        fetcher = poke_api.Fetcher()
+        asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        # /type/fire/, four pokemon, /type/1/ and three moves
+        self.assertEqual(len(self.server.requests), 9)
+        self.assertEqual(set(self.server.requests.values()), {1})
+        self.assertEqual(fetcher.misses, 9)
+        self.assertEqual(fetcher.hits, 4 * 4 - 4)
+
+    def test_stream(self):
+        async def collect():
+            return [pokemon async for pokemon in poke_api.stream("type", "fire")]
+
+        streamed = asyncio.run(collect())
+        fetched = asyncio.run(poke_api.get_pokemon_by_type("fire"))
+        self.assertCountEqual(streamed, fetched)
+
+    def test_stream_early_exit(self):
+        async def first():
+            fetcher = poke_api.Fetcher(concurrency=1)
+            async with contextlib.aclosing(
+                poke_api.stream("type", "fire", fetcher)
+            ) as pokemon_stream:
+                async for pokemon in pokemon_stream:
+                    return pokemon
+
+        asyncio.run(first())
+        self.assertNotIn("/pokemon/3/", self.server.requests)
+
+    def assertClosesItsFetcher(self, run):
+        with mock.patch.object(
+            poke_api.Fetcher, "close", autospec=True, side_effect=poke_api.Fetcher.close
+        ) as close:
+            asyncio.run(run(None))
+            self.assertEqual(close.call_count, 1)
+            (fetcher,), _ = close.call_args
+            self.assertTrue(fetcher._executor._shutdown)
+
+            # one passed in is left open for the caller
+            fetcher = poke_api.Fetcher()
+            asyncio.run(run(fetcher))
+            self.assertEqual(close.call_count, 1)
+            self.assertFalse(fetcher._executor._shutdown)
+            fetcher.close()
+
+    def test_get_json_closes_its_fetcher(self):
+        self.assertClosesItsFetcher(
+            lambda fetcher: poke_api.get_json(
+                f"{poke_api.BASE_URL}/type/fire/", fetcher
+            )
+        )
+
+    def test_fetch_closes_its_fetcher(self):
+        self.assertClosesItsFetcher(
+            lambda fetcher: poke_api.fetch("type", "fire", fetcher)
+        )
+
+    def test_generators_close_their_fetcher(self):
+        async def first(fetcher):
+            async with contextlib.aclosing(
+                poke_api.stream("type", "fire", fetcher)
+            ) as pokemon_stream:
+                async for pokemon in pokemon_stream:
+                    return pokemon
+
+        async def crawl(fetcher):
+            async with contextlib.aclosing(poke_api.crawl_pages(fetcher)) as pages:
+                return [page async for page in pages]
+
+        self.assertClosesItsFetcher(first)
+        self.assertClosesItsFetcher(crawl)
+
+    def test_cache_eviction(self):
+        fetcher = poke_api.Fetcher(cache_size=2)
+        asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertEqual(len(fetcher._cache), 2)
+
+
+class HttpClientTestCase(StandInServerTestCase):
+    def client(self, **kwargs):
+        kwargs.setdefault("backoff", 0.01)
+        client = poke_api.HttpClient(**kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_reused(self):
+        fetcher = poke_api.Fetcher(concurrency=2, client=self.client(concurrency=2))
+        asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertEqual(sum(self.server.requests.values()), 9)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_transient_errors_retried(self):
+        self.server.faults["/type/fire/"] = [503, 502]
+        self.server.faults["/move/1/"] = [429]
+        client = self.client()
+        fetcher = poke_api.Fetcher(client=client)
+        pokemon_list = asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertEqual(len(pokemon_list), 4)
+        self.assertEqual(self.server.requests["/type/fire/"], 3)
+
+        (stats,) = client.hosts.values()
+        self.assertEqual(stats.requests, 12)
+        self.assertEqual(stats.retries, 3)
+        self.assertEqual(stats.failures, 3)
+        self.assertIn("12 requests, 3 retries", fetcher.stats())
+
+    def test_retries_exhausted(self):
+        self.server.faults["/type/fire/"] = [503] * 3
+        fetcher = poke_api.Fetcher(client=self.client(retries=2))
+        with self.assertRaises(requests.HTTPError):
+            asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertEqual(self.server.requests["/type/fire/"], 3)
+
+    def test_client_errors_not_retried(self):
+        self.server.faults["/type/fire/"] = [404]
+        fetcher = poke_api.Fetcher(client=self.client())
+        with self.assertRaises(requests.HTTPError):
+            asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        self.assertEqual(self.server.requests["/type/fire/"], 1)
+
+    def test_retry_after_honoured(self):
+        self.server.faults["/type/fire/"] = [429]
+        self.server.retry_after = "0.3"
+        client = self.client(backoff=0)
+        started = time.perf_counter()
+        client.get(f"{self.server.base_url}/type/fire/").raise_for_status()
+        self.assertGreaterEqual(time.perf_counter() - started, 0.3)
+
+    def test_timeout(self):
+        self.server.latency = 0.5
+        client = self.client(retries=1, timeout=0.1)
+        started = time.perf_counter()
+        with self.assertRaises(requests.Timeout):
+            client.get(f"{self.server.base_url}/type/fire/")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        (stats,) = client.hosts.values()
+        self.assertEqual((stats.requests, stats.failures), (2, 2))
+
+    def test_rate_limit(self):
+        client = self.client(concurrency=1, rate=20)
+        fetcher = poke_api.Fetcher(concurrency=4, client=client)
+        started = time.perf_counter()
+        asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        # one token saved up, then one every 50 ms for the other eight requests
+        self.assertGreaterEqual(time.perf_counter() - started, 8 * 0.05)
+
+
+class RetryDelayTestCase(unittest.TestCase):
+    def response(self, **headers):
+        response = requests.Response()
+        response.headers.update(headers)
+        return response
+
+    def test_exponential_backoff_with_jitter(self):
+        delays = [poke_api.retry_delay(None, 3, backoff=0.5) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_backoff_capped(self):
+        delay = poke_api.retry_delay(None, 30, backoff=0.5, backoff_max=2)
+        self.assertLessEqual(delay, 2)
+
+    def test_retry_after_seconds(self):
+        response = self.response(**{"Retry-After": "3"})
+        self.assertEqual(poke_api.retry_delay(response, 0), 3.0)
+
+    def test_retry_after_date(self):
+        at = email.utils.formatdate(time.time() + 10, usegmt=True)
+        delay = poke_api.retry_delay(self.response(**{"Retry-After": at}), 0)
+        self.assertTrue(8 <= delay <= 10)
+
+
+class DiskCacheTestCase(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def crawl(self, **kwargs):
+        disk_cache = poke_api.DiskCache(self.cache_dir.name, **kwargs)
+        fetcher = poke_api.Fetcher(disk_cache=disk_cache)
+        pokemon_list = asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher))
+        return pokemon_list, disk_cache
+
+    def test_warm_run_served_from_disk(self):
+        cold, disk_cache = self.crawl()
+        self.assertEqual(disk_cache.stored, 9)
+        self.server.requests.clear()
+
+        warm, disk_cache = self.crawl()
+        self.assertEqual(warm, cold)
+        self.assertEqual(disk_cache.hits, 9)
+        self.assertEqual(sum(self.server.requests.values()), 0)
+
+    def test_stale_entries_revalidated(self):
+        cold, _ = self.crawl()
+
+        warm, disk_cache = self.crawl(ttl=0)
+        self.assertEqual(warm, cold)
+        self.assertEqual(disk_cache.revalidated, 9)
+        self.assertEqual(disk_cache.stored, 0)
+
+    def test_offline(self):
+        cold, _ = self.crawl()
+        self.server.requests.clear()
+
+        offline, _ = self.crawl(ttl=0, offline=True)
+        self.assertEqual(offline, cold)
+        self.assertEqual(sum(self.server.requests.values()), 0)
+
+    def test_offline_miss(self):
+        with self.assertRaises(poke_api.OfflineCacheMiss):
+            self.crawl(offline=True)
+
+
+class CrawlTestCase(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.checkpoint_path = self.directory / "checkpoint.json"
+
+    def crawl(self, fetcher=None, checkpoint=None, pages=None):
+        async def collect():
+            crawled = []
+            async with contextlib.aclosing(
+                poke_api.crawl_pages(fetcher, checkpoint, page_size=2)
+            ) as crawl:
+                async for pokemon_list in crawl:
+                    crawled.append([pokemon.name for pokemon in pokemon_list])
+                    if len(crawled) == pages:
+                        break
+            return crawled
+
+        return asyncio.run(collect())
+
+    def test_full_crawl(self):
+        pages = self.crawl()
+        self.assertEqual(
+            pages,
+            [["pokemon-0", "pokemon-1"], ["pokemon-2", "pokemon-3"], ["pokemon-4"]],
+        )
+        self.assertEqual(self.server.requests["/pokemon/?limit=2&offset=0"], 1)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = poke_api.Checkpoint(self.checkpoint_path)
+        # stop while the second page is being processed: only the first is done
+        self.crawl(checkpoint=checkpoint, pages=2)
+        state = json.loads(self.checkpoint_path.read_text())
+        self.assertEqual(state["pages"], 1)
+        self.assertEqual(state["pokemon"], 2)
+        self.server.requests.clear()
+
+        resumed = self.crawl(checkpoint=poke_api.Checkpoint(self.checkpoint_path))
+        self.assertEqual(resumed, [["pokemon-2", "pokemon-3"], ["pokemon-4"]])
+        self.assertNotIn("/pokemon/?limit=2&offset=0", self.server.requests)
+        self.assertNotIn("/pokemon/0/", self.server.requests)
+        self.assertFalse(self.checkpoint_path.exists())
+
+    def test_checkpoint_of_another_crawl_ignored(self):
+        self.checkpoint_path.write_text(
+            json.dumps({"start": "elsewhere", "next_page": "elsewhere", "pages": 3})
+        )
+        pages = self.crawl(checkpoint=poke_api.Checkpoint(self.checkpoint_path))
+        self.assertEqual(len(pages), 3)
+
+    def test_unchanged_catalog_revalidated(self):
+        cache_dir = self.directory / "cache"
+        disk_cache = poke_api.DiskCache(cache_dir)
+        self.crawl(poke_api.Fetcher(disk_cache=disk_cache))
+        # three list pages, five pokemon, one type and three moves
+        self.assertEqual(disk_cache.stored, 12)
+
+        disk_cache = poke_api.DiskCache(cache_dir, ttl=0)
+        self.crawl(poke_api.Fetcher(disk_cache=disk_cache))
+        self.assertEqual(disk_cache.revalidated, 12)
+        self.assertEqual(disk_cache.stored, 0)
+
+
+class StandInTestCase(unittest.TestCase):
+    def serve(self, corpus, **kwargs):
+        server = self.enterContext(StandInServer(corpus, **kwargs))
+        self.enterContext(mock.patch.multiple(poke_api, BASE_URL=server.base_url))
+        return server
+
+    def catalog(self):
+        return SyntheticCatalog(pokemon=30, moves=20, moves_per_pokemon=5)
+
+    def test_synthetic_catalog(self):
+        catalog = self.catalog()
+        self.serve(catalog)
+        pokemon_list = asyncio.run(poke_api.get_pokemon_by_move("move-3", limit=0))
+        self.assertEqual(
+            sorted(pokemon.order for pokemon in pokemon_list),
+            catalog._learned_by["move"][3],
+        )
+        for pokemon in pokemon_list:
+            self.assertIn("move-3", [move.name for move in pokemon.moves])
+
+    def test_error_rate(self):
+        server = self.serve(self.catalog(), error_rate=1.0)
+        client = poke_api.HttpClient(retries=1, backoff=0)
+        self.addCleanup(client.close)
+        fetcher = poke_api.Fetcher(client=client)
+        with self.assertRaises(requests.HTTPError):
+            asyncio.run(poke_api.get_pokemon_by_type("type-1", fetcher, limit=0))
+        self.assertEqual(server.errors, 2)
+
+    def test_errors_retried(self):
+        server = self.serve(self.catalog(), error_rate=0.2, seed=1)
+        client = poke_api.HttpClient(retries=10, backoff=0)
+        self.addCleanup(client.close)
+        fetcher = poke_api.Fetcher(client=client)
+        asyncio.run(poke_api.get_pokemon_by_type("type-1", fetcher, limit=0))
+        (stats,) = client.hosts.values()
+        self.assertGreater(server.errors, 0)
+        self.assertEqual(stats.retries, server.errors)
+
+    def test_rate_limit(self):
+        server = self.serve(self.catalog(), rate=5)
+        url = f"{server.base_url}/move/1/"
+        statuses = [requests.get(url) for _ in range(10)]
+        throttled = [response for response in statuses if response.status_code == 429]
+        self.assertEqual(len(throttled), server.throttled)
+        self.assertGreater(server.throttled, 0)
+        self.assertLessEqual(float(throttled[0].headers["Retry-After"]), 0.2)
+
+    def test_recorded_corpus(self):
+        recorder = self.serve(StandInCorpus(5))
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        fetcher = poke_api.Fetcher(disk_cache=poke_api.DiskCache(directory))
+        recorded = asyncio.run(poke_api.get_pokemon_by_type("fire", fetcher, limit=0))
+
+        corpus = RecordedCorpus(directory, recorded_base=recorder.base_url)
+        replay = self.serve(corpus)
+        self.assertNotEqual(replay.base_url, recorder.base_url)
+        replayed = asyncio.run(poke_api.get_pokemon_by_type("fire", limit=0))
+        self.assertCountEqual(replayed, recorded)
+        self.assertEqual(sum(replay.requests.values()), 9)
+        self.assertEqual(
+            requests.get(f"{replay.base_url}/type/water/").status_code, 404
+        )